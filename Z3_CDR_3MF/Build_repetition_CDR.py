@@ -1,85 +1,287 @@
-import xml.etree.ElementTree as ET
-import file_handle as fd
-import catalog_examine as ce
-import re
-
-def strip_namespace(tag):
-    return re.sub(r'\{.*?\}', '', tag)
-
-def strlist_calculate(strl1, strl2):
-    # Determine whether the values of two string lists are equal
-    list1 = list(map(float, strl1.strip().split()))
-    list2 = list(map(float, strl2.strip().split()))
-
-    if len(list1) != len(list2):
-        raise Exception('list1 and list2 must have the same length')
-    result = True
-    for i in range(len(list1)):
-        if list1[i] == list2[i]:
-            result = result and True
-        else:
-            result = result and False
-            break
-    return result
-
-def Build_repetition_dection(input_file):
-    """
-    function: Perform build repetition detection on input_file
-    """
-    # Find all object elements and convert them into dictionary format
-    objs = fd.get_file_objects(input_file)
-    objects = {obj.attrib.get('id', 'empty'): obj for obj in objs}
-    # Find all item elements
-    items = fd.get_file_items(input_file)
-
-    # Exception handling: objects or items are empty
-    if len(objects) == 0:
-        raise FileNotFoundError
-    if len(items) == 0:
-        raise FileNotFoundError
-
-    # Extract object-related content from build, including id and corresponding transform
-    builds = []
-    for index, item in enumerate(items):
-        builds.append([item.get("objectid", "empty"), item.get("transform", "1 0 0 0 1 0 0 0 1 0 0 0"), index])
-    build_ids = [l[0] for l in builds]
-    build_trans = [list(map(lambda x: round(float(x), 4), l[1].strip().split())) for l in builds]
-
-    # Perform DOS defense on build: return a list of IDs to be deleted
-    dos = []
-    for cur in range(len(builds)):
-        for other in range(cur + 1, len(builds)):
-            if builds[cur][0] == builds[other][0] and strlist_calculate(builds[cur][1], builds[other][1]):
-                dos.append(other)
-    dos = list(set(dos))
-
-    return dos
-
-def Build_repetition_defense(input_file, output_file):
-    """
-    function: Perform build repetition defense on input_file
-    """
-    dos = Build_repetition_dection(input_file)
-
-    if len(dos) == 0:
-        raise EOFError
-    else:
-        # Parse the original XML file
-        tree = ET.parse(input_file)
-        root = tree.getroot()
-
-        to_remove = []
-        for child in root:
-            if strip_namespace(child.tag) == 'build':
-                for index, item in enumerate(child):
-                    if index in dos:
-                        to_remove.append(item)
-                for delte in to_remove:
-                    child.remove(delte)
-            else:
-                pass
-
-        # Convert the processed tree into an XML file
-        fd.indent(root)
-        new_tree = ET.ElementTree(root)
-        new_tree.write(output_file, encoding="utf-8", xml_declaration=True)
+import numpy as np
+import file_handle as fd
+import re
+
+def strip_namespace(tag):
+    return re.sub(r'\{.*?\}', '', tag)
+
+def strlist_calculate(strl1, strl2):
+    # Determine whether the values of two string lists are equal
+    list1 = list(map(float, strl1.strip().split()))
+    list2 = list(map(float, strl2.strip().split()))
+
+    if len(list1) != len(list2):
+        raise Exception('list1 and list2 must have the same length')
+    result = True
+    for i in range(len(list1)):
+        if list1[i] == list2[i]:
+            result = result and True
+        else:
+            result = result and False
+            break
+    return result
+
+def quantize_transform(transform, tolerance=0.0):
+    """
+    Hashable key of a 12-float transform.
+    With tolerance 0 the floats are compared exactly (same result as strlist_calculate);
+    otherwise each value is snapped to a grid of step tolerance.
+    """
+    if tolerance > 0:
+        return tuple(round(value / tolerance) for value in transform)
+    return tuple(transform)
+
+def Build_repetition_groups(input_file, tolerance=0.0):
+    """
+    function: Group the build items that repeat the same (objectid, transform) in one pass
+    input_file: Path to the model file, the model content as bytes, or a ModelDocument
+    tolerance: Grid step used to compare transforms (0 means exact comparison)
+    return: List of (kept index, [removed indexes]), the kept item being the first occurrence
+    """
+    doc = fd.as_model_document(input_file)
+
+    # Exception handling: objects or items are empty
+    if len(doc.objects) == 0:
+        raise FileNotFoundError
+    if len(doc.items) == 0:
+        raise FileNotFoundError
+
+    # Hash every build item on its object id and quantized transform
+    groups = {}
+    for (objectid, _, index), transform in zip(doc.builds, doc.transforms):
+        groups.setdefault((objectid, quantize_transform(transform, tolerance)), []).append(index)
+
+    return [(indexes[0], indexes[1:]) for indexes in groups.values() if len(indexes) > 1]
+
+def Component_repetition_groups(input_file, tolerance=0.0):
+    """
+    function: Group the components that repeat the same (objectid, transform) inside each <components> element
+    input_file: Path to the model file, the model content as bytes, or a ModelDocument
+    tolerance: Grid step used to compare transforms (0 means exact comparison)
+    return: Dictionary {object id: [(kept index, [removed indexes])]} for the objects whose component
+            list repeats, indexes being positions in the <components> element
+
+    Each component list is hashed once per object, however often the object is referenced, so a
+    repetition nested inside a sub-assembly is found once and removed once.
+    """
+    doc = fd.as_model_document(input_file)
+
+    repeated = {}
+    for obj_id, components in doc.components.items():
+        if obj_id not in doc.objects:
+            continue  # Objects without an id cannot be referenced
+        groups = {}
+        for index, (objectid, transform) in enumerate(components):
+            groups.setdefault((objectid, quantize_transform(transform, tolerance)), []).append(index)
+        found = [(indexes[0], indexes[1:]) for indexes in groups.values() if len(indexes) > 1]
+        if found:
+            repeated[obj_id] = found
+    return repeated
+
+def Component_repetition_dection(input_file, tolerance=0.0, max_instances=fd.MAX_BUILD_INSTANCES):
+    """
+    function: Perform component repetition detection on input_file and count the printed copies
+    input_file: Path to the model file, the model content as bytes, or a ModelDocument
+    tolerance: Grid step used to compare transforms (0 means exact comparison)
+    max_instances: Largest accepted number of mesh instances for the whole build, once the repeated
+                   components are removed
+    return: Dictionary with
+        'groups': result of Component_repetition_groups,
+        'instances': effective number of mesh instances of every build item (components multiplied out),
+        'deduplicated': the same count once the repeated components are removed
+    raise ValueError: If the deduplicated build still expands beyond max_instances; only counts are
+                      computed (memoized per sub-assembly), no geometry is touched
+    """
+    doc = fd.as_model_document(input_file)
+    repeated = Component_repetition_groups(doc, tolerance)
+    removed = {obj_id: {index for _, indexes in groups for index in indexes} for obj_id, groups in repeated.items()}
+
+    counts = {}
+    report = {
+        'groups': repeated,
+        'instances': [doc.instance_count(build[0]) for build in doc.builds],
+        'deduplicated': [doc.instance_count(build[0], removed, counts) for build in doc.builds],
+    }
+    total = sum(report['deduplicated'])
+    if total > max_instances:
+        raise ValueError("Build expands to %d mesh instances (limit %d)" % (total, max_instances))
+    return report
+
+def remove_repeated_components(doc, repeated):
+    """
+    function: Remove the repeated component elements from the tree (the first occurrence is kept)
+    doc: ModelDocument, modified in place and reindexed
+    repeated: Result of Component_repetition_groups
+    """
+    for obj_id, groups in repeated.items():
+        com = doc.objects[obj_id].find('.//{%s}components' % fd.NS_CORE)
+        dos = {index for _, indexes in groups for index in indexes}
+        com[:] = [child for index, child in enumerate(com) if index not in dos]
+    doc.reindex()
+
+def Component_repetition_defense(input_file, output_file, repeated=None, tolerance=0.0):
+    """
+    function: Perform component repetition defense on input_file
+    A ModelDocument passed as input_file is modified in place.
+    repeated: Optional result of Component_repetition_groups, computed when not given
+    """
+    doc = fd.as_model_document(input_file)
+    if repeated is None:
+        repeated = Component_repetition_groups(doc, tolerance)
+
+    if len(repeated) == 0:
+        raise EOFError
+    remove_repeated_components(doc, repeated)
+    doc.write(output_file)
+
+def assembly_signature(doc, objectid, tolerance=1e-6):
+    """
+    function: Hashable key of the geometry an object places in its own frame
+    doc: ModelDocument
+    objectid: Object id
+    tolerance: Quantization step used for coordinates and transforms
+    return: ('mesh', fingerprint) for a plain mesh object, ('assembly', sorted instance keys) for an
+            object made of components, ('id', objectid) for an object without any mesh
+    """
+    if objectid in doc.meshes and not doc.components.get(objectid):
+        return ('mesh', doc.object_fingerprint(objectid, tolerance))
+    mesh_ids, matrices = doc.object_instances(objectid)
+    if len(mesh_ids) == 0:
+        return ('id', objectid)
+    return ('assembly', tuple(sorted(
+        (doc.object_fingerprint(mesh_id, tolerance), quantize_transform(matrix[:3].ravel().tolist(), tolerance))
+        for mesh_id, matrix in zip(mesh_ids, matrices))))
+
+def placed_geometry(doc, instances):
+    """
+    function: World-space geometry of a build item, the instances of an assembly being concatenated
+    doc: ModelDocument
+    instances: Mesh instances of the build item, as listed by file_handle.resolve_build_instances
+    return: (vertices, triangles) arrays, or None if the item places no triangle
+    """
+    vertices, triangles, offset = [], [], 0
+    for mesh_id, matrix in instances:
+        arrays = doc.mesh_arrays(mesh_id)
+        vertices.append(fd.apply_transform_array(arrays[0], matrix))
+        triangles.append(arrays[1] + offset)
+        offset += len(arrays[0])
+    if sum(len(part) for part in triangles) == 0:
+        return None
+    return np.concatenate(vertices), np.concatenate(triangles)
+
+def Geometry_repetition_groups(input_file, tolerance=1e-6):
+    """
+    function: Group the build items that place identical geometry, even under different object ids
+    input_file: Path to the model file, the model content as bytes, or a ModelDocument
+    tolerance: Quantization step used for coordinates and transforms
+    return: List of (kept index, [removed indexes]), the kept item being the first occurrence
+
+    Items are first hashed on (signature of the untransformed object, quantized transform); the
+    object fingerprints are cached by the document, so each mesh is hashed once however often it
+    is placed. Objects made of components are flattened into their mesh instances (memoized per
+    sub-assembly) and signed by the sorted (fingerprint, transform) of those instances; the world
+    instances come from file_handle.resolve_build_instances.
+    Remaining items whose placed geometry could still coincide (same triangle count and
+    same world bounding box) are then compared on the fingerprint of their transformed geometry.
+    Objects without any mesh fall back to their object id.
+    """
+    doc = fd.as_model_document(input_file)
+
+    # Exception handling: objects or items are empty
+    if len(doc.objects) == 0:
+        raise FileNotFoundError
+    if len(doc.items) == 0:
+        raise FileNotFoundError
+
+    # Mesh instances of every item; builds whose component hierarchy expands too far are rejected
+    # before any matrix is composed
+    instances = fd.resolve_build_instances(doc)
+
+    # Level 1: same local geometry at the same placement
+    groups = {}
+    signatures = {}
+    for (objectid, _, index), transform in zip(doc.builds, doc.transforms):
+        if objectid not in signatures:
+            signatures[objectid] = assembly_signature(doc, objectid, tolerance)
+        groups.setdefault((signatures[objectid], quantize_transform(transform, tolerance)), []).append(index)
+    groups = list(groups.values())
+
+    # Level 2: different local geometry, candidates bucketed on triangle count and world bounding box
+    buckets = {}
+    used_vertices = {}  # Vertices referenced by triangles, per mesh object id
+    for group_index, indexes in enumerate(groups):
+        triangle_count = 0
+        corners = []
+        for mesh_id, matrix in instances[indexes[0]]:
+            arrays = doc.mesh_arrays(mesh_id)
+            if len(arrays[1]) == 0:
+                continue
+            if mesh_id not in used_vertices:
+                used_vertices[mesh_id] = arrays[0][np.unique(arrays[1])]
+            triangle_count += len(arrays[1])
+            corners.append(fd.apply_transform_array(used_vertices[mesh_id], matrix))
+        if triangle_count == 0:
+            continue
+        vertices = np.concatenate(corners)
+        bounds = np.round(np.concatenate([vertices.min(axis=0), vertices.max(axis=0)]) / tolerance)
+        buckets.setdefault((triangle_count, tuple(bounds.tolist())), []).append(group_index)
+
+    merged = {}
+    for candidates in buckets.values():
+        if len(candidates) < 2:
+            continue
+        for group_index in candidates:
+            indexes = groups[group_index]
+            vertices, triangles = placed_geometry(doc, instances[indexes[0]])
+            fingerprint = fd.mesh_fingerprint(vertices, triangles, tolerance)
+            merged.setdefault(fingerprint, []).append(group_index)
+
+    for group_indexes in merged.values():
+        if len(group_indexes) > 1:
+            combined = sorted(index for group_index in group_indexes for index in groups[group_index])
+            for group_index in group_indexes:
+                groups[group_index] = []
+            groups.append(combined)
+
+    return sorted((indexes[0], indexes[1:]) for indexes in groups if len(indexes) > 1)
+
+def Build_repetition_dection(input_file, tolerance=0.0):
+    """
+    function: Perform build repetition detection on input_file
+    input_file: Path to the model file, the model content as bytes, or a ModelDocument
+    return: Sorted list of the build item indexes to be deleted
+    """
+    # Perform DOS defense on build: return a list of IDs to be deleted
+    dos = [index for _, removed in Build_repetition_groups(input_file, tolerance) for index in removed]
+    return sorted(dos)
+
+def Build_repetition_defense(input_file, output_file, groups=None, tolerance=0.0):
+    """
+    function: Perform build repetition defense on input_file
+    A ModelDocument passed as input_file is modified in place.
+    groups: Optional result of Build_repetition_groups, computed when not given
+    """
+    doc = fd.as_model_document(input_file)
+    if groups is None:
+        groups = Build_repetition_groups(doc, tolerance)
+    dos = {index for _, removed in groups for index in removed}
+
+    if len(dos) == 0:
+        raise EOFError
+    else:
+        root = doc.root
+
+        to_remove = []
+        for child in root:
+            if strip_namespace(child.tag) == 'build':
+                for index, item in enumerate(child):
+                    if index in dos:
+                        to_remove.append(item)
+                for delte in to_remove:
+                    child.remove(delte)
+            else:
+                pass
+
+        # Convert the processed tree into an XML file
+        doc.reindex()
+        doc.write(output_file)
@@ -1,91 +1,104 @@
-import file_handle as fd
-
-def build_tree_with_depth(tree, root, depth=1):
-    """
-    Build tree structure and calculate the minimum depth of each node.
-
-    :param tree: Dictionary representing hierarchical relationships, e.g., {'2': ['1', '1'], ...}.
-    :param root: Current root node of the tree.
-    :param depth: Current node depth (recursion depth).
-    :return: Tree structure including nodes and their minimum depths.
-    """
-    return {
-        'id': root,
-        'depth': depth,
-        'children': [build_tree_with_depth(tree, child, depth + 1) for child in tree.get(root, [])]
-    }
-
-def depth_tree_node(tree, node_id):
-    """
-    Query the minimum depth of a specific node.
-
-    :param tree: Constructed tree structure.
-    :param node_id: Target node ID to query.
-    :return: Minimum depth of the node.
-    """
-    if tree['id'] == node_id:
-        return tree['depth']
-    for child in tree.get('children', []):
-        result = depth_tree_node(child, node_id)
-        if result is not None:
-            return result
-    return 0  # Return 0 if node not found
-
-def max_components_depth(filepath, node_id):
-    """
-    Calculate the maximum iteration count for a specific node.
-
-    :param filepath: File path to process.
-    :param node_id: Target node ID to calculate.
-    :return: Maximum iteration count for the node.
-    """
-    # Initialize result array to store depth of each node
-    res = []
-
-    # Extract objects containing components from file and build tree_dict
-    # tree_dict example: {'1': [], '2': ['1', '1'], '3': ['2', '1'], '4': ['3', '2'], '5': ['4', '3'], '6': []}
-    # Where [] indicates no components
-    objs = fd.get_file_objects(filepath)
-    tree_dict = {}
-    for obj in objs:
-        obj_id = obj.get("id")
-        tree_dict[obj_id] = []
-        com = obj.find('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}components')
-        if com is not None:
-            for child in com:
-                tree_dict[obj_id].append(child.get("objectid", "empty"))
-
-    # Build tree with specified node as root
-    tree_res = build_tree_with_depth(tree_dict, node_id)
-
-    # Get depth of all nodes and return the maximum value
-    for id in tree_dict.keys():
-        res.append(depth_tree_node(tree_res, id))
-
-    return max(res)
-
-def check_circular_reference_depth(filepath, max_depth=5):
-    """
-    Check if circular references exceed maximum allowed depth.
-
-    :param filepath: File path to process.
-    :param max_depth: Maximum allowed iteration count (default: 5).
-    :return: False if exceeds max depth, True otherwise.
-    """
-    items = fd.get_file_items(filepath)
-
-    # Find build object IDs
-    builds = []
-    for index, item in enumerate(items):
-        builds.append([item.get("objectid", "empty"),
-                      item.get("transform", "1 0 0 0 1 0 0 0 1 0 0 0"),
-                      index])
-    build_ids = [l[0] for l in builds]
-
-    # Check if any node exceeds max iteration count
-    for build_id in build_ids:
-        res = max_components_depth(filepath, build_id)
-        if res >= max_depth:
-            return False  # Exceeds max iteration count
-
-    return True  # Within allowed iteration count
\ No newline at end of file
+import file_handle as fd
+
+def component_depths(tree_dict, roots):
+    """
+    Memoized iterative DFS over the components adjacency, O(V+E) for all roots together.
+    The depth of a node counts the node itself: an object without components has depth 1,
+    ids that are not objects of the document have depth 0, and nodes on a cycle have depth inf.
+
+    :param tree_dict: Dictionary {object id: [component object ids]}.
+    :param roots: Object IDs to start from (e.g. the build items).
+    :return: (dictionary {object id: depth}, first cycle found as a list of ids or []).
+    """
+    depths = {}
+    visiting = set()
+    cycle = []
+    for root in roots:
+        if root in depths or root not in tree_dict:
+            continue
+        stack = [(root, iter(tree_dict[root]))]
+        path = [root]
+        visiting.add(root)
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if child in depths or child not in tree_dict:
+                    continue
+                if child in visiting:
+                    # Back edge: record the first cycle, its nodes end up with an infinite depth
+                    if not cycle:
+                        cycle = path[path.index(child):] + [child]
+                    continue
+                stack.append((child, iter(tree_dict[child])))
+                path.append(child)
+                visiting.add(child)
+                break
+            else:
+                stack.pop()
+                path.pop()
+                visiting.discard(node)
+                depths[node] = 1 + max((depths.get(child, float("inf")) for child in tree_dict[node]
+                                        if child in tree_dict), default=0)
+    return depths, cycle
+
+def analyze_component_graph(filepath, max_fanout=None):
+    """
+    Analyze the component graph of a model in a single O(V+E) pass.
+
+    :param filepath: File path to process, or a ModelDocument.
+    :param max_fanout: Optional maximum number of components per object.
+    :return: Dictionary with
+        'depths': maximum component depth of every build item (0 for unknown ids, inf on a cycle),
+        'max_depth': maximum of 'depths' (0 without build items),
+        'cycle': first circular reference found, as a list of object ids, or [],
+        'fanout': (object id, number of components) of the object with the largest fan-out,
+        'fanout_offenders': ids of the objects with more than max_fanout components.
+    """
+    doc = fd.as_model_document(filepath)
+    tree_dict = {obj_id: [child_id for child_id, _ in children] for obj_id, children in doc.components.items()}
+    build_ids = [l[0] for l in doc.builds]
+
+    depths, cycle = component_depths(tree_dict, build_ids)
+    item_depths = [depths.get(build_id, 0) for build_id in build_ids]
+    fanout = max(((obj_id, len(children)) for obj_id, children in tree_dict.items()),
+                 key=lambda entry: entry[1], default=(None, 0))
+    offenders = [] if max_fanout is None else \
+        [obj_id for obj_id, children in tree_dict.items() if len(children) > max_fanout]
+
+    return {
+        'depths': item_depths,
+        'max_depth': max(item_depths, default=0),
+        'cycle': cycle,
+        'fanout': fanout,
+        'fanout_offenders': offenders,
+    }
+
+def max_components_depth(filepath, node_id):
+    """
+    Calculate the maximum iteration count for a specific node.
+
+    :param filepath: File path to process, or a ModelDocument.
+    :param node_id: Target node ID to calculate.
+    :return: Maximum iteration count for the node (inf if it reaches a circular reference).
+    """
+    # tree_dict example: {'1': [], '2': ['1', '1'], '3': ['2', '1'], '4': ['3', '2'], '5': ['4', '3'], '6': []}
+    # Where [] indicates no components
+    doc = fd.as_model_document(filepath)
+    tree_dict = {obj_id: [child_id for child_id, _ in children] for obj_id, children in doc.components.items()}
+
+    depths, _ = component_depths(tree_dict, [node_id])
+    return depths.get(node_id, 0)
+
+def check_circular_reference_depth(filepath, max_depth=5):
+    """
+    Check if circular references exceed maximum allowed depth.
+
+    :param filepath: File path to process, or a ModelDocument.
+    :param max_depth: Maximum allowed iteration count (default: 5).
+    :return: False if exceeds max depth or contains a cycle, True otherwise.
+    """
+    report = analyze_component_graph(filepath)
+    if report['cycle'] or report['max_depth'] >= max_depth:
+        return False  # Exceeds max iteration count
+
+    return True  # Within allowed iteration count
@@ -0,0 +1,279 @@
+import Circular_reference_CDR as ie
+import catalog_examine as ce
+import Steganographic_CDR as SC
+import Build_repetition_CDR as RD
+import Model_overlap_CDR as MO
+import Hollow_Embedding_CDR as MC
+import file_handle as fd
+import numpy as np
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+
+def scan_mesh_arrays(vertices, triangles):
+    """
+    Per-mesh part of fused_scan: duplicate-triangle mask and steganographic ordering of one mesh.
+
+    :return: (keep mask of Model_overlap_CDR.find_unique_triangles, seq_point_index of every triangle)
+    """
+    return MO.find_unique_triangles(vertices, triangles), SC.seq_point_index(vertices, triangles)
+
+
+def fused_scan(model_file, max_depth=5, workers=1):
+    """
+    Run every 3mf detector on one parsed model.
+    The model is parsed once and each mesh is converted to arrays once; the detectors share the
+    document and its caches (mesh arrays, fingerprints, flattened component instances).
+    Order: component graph, component repetition, per-object pass (steganographic ordering and
+    duplicate triangles), build repetition, then hollow embedding on the build items that survive
+    the repetition removal.
+    The only change made to the document is the removal of the repeated components, so that the
+    geometry detectors see the hierarchy that will be written; everything else is applied by fused_defense.
+
+    :param model_file: Path to the model file, the model content as bytes, or a ModelDocument
+    :param max_depth: Component depth from which the geometry detectors are not run
+    :param workers: Number of worker processes for the per-object pass and the hollow-embedding matrix
+    :return: (ModelDocument, report) where report is a dictionary with
+        'max_depth': largest component depth of the build items,
+        'components': {object id: component repetition groups} (Build_repetition_CDR.Component_repetition_groups),
+        'instances': effective number of mesh instances of every build item, repeated components included,
+        'steganographic': True if a steganographic attack is detected,
+        'steg_triangles': number of triangles whose vertex order would be rotated,
+        'steg_order': {object id: seq_point_index of every triangle},
+        'overlaps': {object id: keep mask} of the meshes with duplicate triangles,
+        'repetition': build repetition groups [(kept index, [removed indexes])],
+        'hollow': indexes of the surviving build items embedded in another one,
+        'skipped': True if the geometry detectors were not run because of the component depth (the
+                   component repetition is still detected and removed)
+    :raises EOFError: If the component graph contains a circular reference
+    :raises ValueError: If the build still expands beyond file_handle.MAX_BUILD_INSTANCES mesh instances
+                        once the repeated components are removed (checked on counts, before any geometry work)
+    """
+    doc = fd.as_model_document(model_file)
+
+    # Component graph: exact depth per build item and any circular reference
+    graph = ie.analyze_component_graph(doc)
+    if graph['cycle']:
+        raise EOFError("file exist circular reference error: " + " -> ".join(graph['cycle']))
+
+    report = {
+        'max_depth': graph['max_depth'],
+        'components': {},
+        'instances': [],
+        'steganographic': False,
+        'steg_triangles': 0,
+        'steg_order': {},
+        'overlaps': {},
+        'repetition': [],
+        'hollow': [],
+        'skipped': graph['max_depth'] >= max_depth,
+    }
+
+    # Component lists: repeated (objectid, transform) at every level, rejected early on the printed copies
+    components = RD.Component_repetition_dection(doc)
+    report['components'] = components['groups']
+    report['instances'] = components['instances']
+    if report['components']:
+        RD.remove_repeated_components(doc, report['components'])
+
+    if report['skipped']:
+        return doc, report
+
+    # One pass over the objects: every per-mesh verdict is taken from the same arrays, in a
+    # process pool when workers > 1
+    report['steganographic'] = any(SC.has_plain_triangles(obj, doc.meshes.get(obj.get("id")))
+                                   for obj in doc.object_list)
+    per_object = fd.map_mesh_objects(doc, scan_mesh_arrays, workers)
+    for obj_id, (keep, best) in per_object.items():
+        if not keep.all():
+            report['overlaps'][obj_id] = keep
+    if report['steganographic']:
+        report['steg_triangles'] = sum(int(np.count_nonzero(best != 0)) for _, best in per_object.values())
+    report['steg_order'] = {obj_id: best for obj_id, (_, best) in per_object.items()}
+
+    # Build level: repetition first, hollow embedding only on the items that are kept. In a production
+    # package the root part may hold only p:path items and the other parts only objects: nothing to compare
+    if not doc.objects or not doc.items:
+        return doc, report
+    report['repetition'] = RD.Geometry_repetition_groups(doc)
+    removed = {index for _, indexes in report['repetition'] for index in indexes}
+    report['hollow'] = MC.UI_disarm(doc, workers=workers, skip=removed)
+    return doc, report
+
+
+def fused_defense(doc, report, output):
+    """
+    Apply every defense found by fused_scan and write the model once.
+    The repeated components have already been removed by fused_scan. Mesh level: duplicate triangles are removed, then the triangle order is normalized (if a
+    steganographic attack was detected). Build level: the repeated and the embedded items are
+    removed together.
+
+    :param doc: ModelDocument returned by fused_scan (modified in place)
+    :param report: Report returned by fused_scan
+    :param output: Output path or file object
+    :return: True if a defense was applied and the model written, False otherwise
+    """
+    removed = {index for _, indexes in report['repetition'] for index in indexes} | set(report['hollow'])
+    if not (report['components'] or report['overlaps'] or report['steganographic'] or removed):
+        return False
+
+    for obj_id, keep in report['overlaps'].items():
+        doc.keep_triangles(obj_id, keep)
+
+    if report['steganographic']:
+        for obj_id in doc.meshes:
+            vertices, triangles = doc.mesh_arrays(obj_id)
+            # The ordering of the scan is reused when no triangle was removed from the mesh
+            best = report['steg_order'].get(obj_id) if obj_id not in report['overlaps'] else None
+            doc.set_mesh_arrays(obj_id, vertices,
+                                SC.normalize_triangle_order(doc.meshes[obj_id], vertices, triangles, best))
+
+    if removed:
+        build = doc.root.find('{%s}build' % fd.NS_CORE)
+        for index in sorted(removed):
+            build.remove(doc.items[index])
+
+    doc.reindex()
+    doc.write(output)
+    return True
+
+
+def fused_disarm(model_file, output, max_depth=5, workers=1):
+    """
+    Scan one model with all detectors and apply all defenses in a single rewrite
+
+    :param model_file: Path to the model file, the model content as bytes, or a ModelDocument
+    :param output: Output path or file object for the defended model
+    :param max_depth: Component depth from which the geometry detectors are not run
+    :param workers: Number of worker processes for the per-object pass and the hollow-embedding matrix
+    :return: Report of fused_scan, with 'defended': True if the model was rewritten
+    """
+    doc, report = fused_scan(model_file, max_depth, workers)
+    report['defended'] = fused_defense(doc, report, output)
+    return report
+
+
+def _disarm_part(task):
+    """
+    Process pool task: read one model part from the package and run fused_disarm on it.
+
+    :param task: (package path, member name, max_depth)
+    :return: (member name, summary of the report, defended model as bytes or None)
+    """
+    filepath, name, max_depth = task
+    with zipfile.ZipFile(filepath, 'r') as zip_ref:
+        content = fd.read_zip_member(zip_ref, name)
+    output = io.BytesIO()
+    doc = fd.ModelDocument(content)
+    report = fused_disarm(doc, output, max_depth)
+    # Keep the report small to send back: masks become the number of removed triangles
+    report['overlaps'] = {obj_id: int(np.count_nonzero(~keep)) for obj_id, keep in report['overlaps'].items()}
+    del report['steg_order']
+    report['paths'] = sorted(ce.model_part_paths(doc.root))
+    report['graph'] = {obj_id: [child for child, _ in children] for obj_id, children in doc.components.items()}
+    report['roots'] = [build[0] for build in doc.builds]
+    return name, report, output.getvalue() if report['defended'] else None
+
+
+def package_node(part, reference):
+    """
+    Node of the package-wide component graph: (member name, object id).
+
+    :param part: Member name of the part that holds the reference
+    :param reference: Object id as returned by file_handle.reference_id ('path#id' for another part)
+    :return: (member name, object id)
+    """
+    path, qualified, obj_id = reference.rpartition('#')
+    if not qualified:
+        return part, reference
+    return ce.resolve_part_name(path), obj_id
+
+
+def package_component_graph(parts):
+    """
+    Merge the component graphs of every part into one graph keyed by (member name, object id), so
+    that depths and circular references are followed across p:path references.
+
+    :param parts: Dictionary {member name: report of _disarm_part}
+    :return: (graph {node: [child nodes]}, build item nodes of every part)
+    """
+    graph = {}
+    roots = []
+    for name, report in parts.items():
+        for obj_id, children in report['graph'].items():
+            graph[(name, obj_id)] = [package_node(name, child) for child in children]
+        roots.extend(package_node(name, root) for root in report['roots'])
+    return graph, roots
+
+
+def _run_parts(tasks, workers):
+    # Run _disarm_part on every task, in a process pool when there are several workers
+    workers = min(workers, len(tasks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_disarm_part, tasks))
+    return [_disarm_part(task) for task in tasks]
+
+
+def disarm_package(filepath, output, workers=None, max_depth=5, reject_depth=15):
+    """
+    Scan every model part of a 3mf package concurrently and write the defended package.
+    The parts are resolved from the relationships graph (catalog_examine.find_model_parts) and
+    dispatched largest first, so the package takes about as long as its biggest part. Parts
+    referenced with p:path but missing from the relationships graph are rejected. Component depth
+    and circular references are checked on the graph of the whole package (package_component_graph),
+    since references across parts are opaque to the scan of a single part; when the package reaches
+    max_depth only across parts, the parts that were fully scanned are scanned again without the
+    geometry detectors, as a single part of that depth would be.
+
+    :param filepath: Path to the 3mf file
+    :param output: Output path of the defended package, written only if a part was defended
+    :param workers: Number of worker processes (None: one per CPU, 1: no pool)
+    :param max_depth: Component depth from which the geometry detectors are not run
+    :param reject_depth: Component depth from which the whole package is rejected, before anything is written
+    :return: Package verdict: dictionary with 'parts' {member name: report}, 'max_depth' (component
+             depth of the package, across parts), 'skipped' (parts whose geometry detectors were not run
+             because of the component depth; every part once the package reaches max_depth) and 'defended'
+    :raises FileNotFoundError: If a part references a model part that is not in the package graph
+    :raises EOFError: If the package has a circular reference (within or across parts) or reaches reject_depth
+    """
+    names = ce.find_model_parts(filepath)
+    with zipfile.ZipFile(filepath, 'r') as zip_ref:
+        sizes = {name: zip_ref.getinfo(name).file_size for name in names}
+    tasks = [(filepath, name, max_depth) for name in sorted(names, key=sizes.get, reverse=True)]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    results = _run_parts(tasks, workers)
+
+    parts = {name: report for name, report, _ in results}
+    missing = {path for report in parts.values() for path in report['paths']} - set(names)
+    if missing:
+        raise FileNotFoundError("Model parts referenced by p:path are not in the package: " + ", ".join(sorted(missing)))
+
+    graph, roots = package_component_graph(parts)
+    depths, cycle = ie.component_depths(graph, roots)
+    if cycle:
+        raise EOFError("file exist circular reference error: " + " -> ".join("%s#%s" % node for node in cycle))
+    deepest = max((depths.get(root, 0) for root in roots), default=0)
+    if deepest >= reject_depth:
+        raise EOFError("Exceeded 20 levels of iteration")
+    if deepest >= max_depth:
+        # Deep only across parts: scan those parts again without the geometry detectors (max_depth 0)
+        rescan = [(filepath, name, 0) for _, name, _ in tasks if not parts[name]['skipped']]
+        if rescan:
+            rescanned = {name: (name, report, content) for name, report, content in _run_parts(rescan, workers)}
+            results = [rescanned.get(name, (name, report, content)) for name, report, content in results]
+            parts = {name: report for name, report, _ in results}
+
+    replaced = {name: content for name, _, content in results if content is not None}
+    if replaced:
+        fd.repack_3mf(filepath, output, replaced)
+    return {
+        'parts': {name: parts[name] for name in names},
+        'max_depth': deepest,
+        'skipped': [name for name in names if parts[name]['skipped']],
+        'defended': bool(replaced),
+    }
@@ -1,157 +1,796 @@
-import numpy as np
-import file_handle as fd
-import xml.etree.ElementTree as ET
-import re
-
-
-def strip_namespace(tag):
-    return re.sub(r'\{.*?\}', '', tag)
-
-
-def strlist_calculate(strl1, strl2):
-    # Check if two string lists represent the same set of float values
-    list1 = list(map(float, strl1.strip().split()))
-    list2 = list(map(float, strl2.strip().split()))
-
-    if len(list1) != len(list2):
-        raise Exception('list1 and list2 must have the same length')
-    result = True
-    for i in range(len(list1)):
-        if list1[i] == list2[i]:
-            result = result and True
-        else:
-            result = result and False
-            break
-    return result
-
-
-def contains_points_with_surface(mesh1, points, tolerance=1e-8):
-    # Compute the shortest distance from points to the mesh surface
-    distances = mesh1.nearest.signed_distance(points)
-
-    for distance in distances:
-        if np.abs(distance) < tolerance:
-            pass
-        else:
-            return False
-    return True
-
-
-def contains_meshes(mesh1, mesh2):
-    # Determine whether mesh1 contains mesh2
-
-    # First, check if all vertices of mesh2 are inside mesh1. If so, mesh1 contains mesh2
-    ver_res = []
-    for vertex in mesh2.vertices:
-        if not mesh1.contains([vertex]):
-            ver_res.append(vertex)
-    if len(ver_res) == 0:
-        return True
-    else:
-        # If some vertices are not strictly inside, check whether they lie on the surface of mesh1
-        if contains_points_with_surface(mesh1, ver_res):
-            return True
-        else:
-            return False
-
-
-def matrix_mosaic_judge(trimeshes):
-    """
-    Determine embedding using a matrix-based method:
-    - Perform matrix-like evaluation on the trimesh_objects using contains_meshes
-    - Diagonal entries are set to False (an object cannot contain itself)
-    - Each column indicates whether the object is contained by any other
-    - A logical OR is applied across each column to determine if an object is embedded in another
-    :param trimeshes: List of trimesh objects
-    :return: List of booleans indicating whether each object is contained by others (True if contained)
-    """
-    judge_list = []  # Initialize result list
-    trimesh_arr = np.array(trimeshes)  # Convert list to NumPy array
-    arr_func = np.frompyfunc(contains_meshes, 2, 1)  # Vectorize contains_meshes for matrix application
-    result = arr_func(trimesh_arr[:, None], trimesh_arr[None, :])  # Perform pairwise containment checks
-    np.fill_diagonal(result, False)  # Set diagonal to False (self-containment not considered)
-
-    for i in range(result.shape[0]):  # For each column, check if object is contained by any other
-        judge_list.append(np.any(result[:, i], axis=0))
-
-    return judge_list  # Return the list of containment results
-
-
-def UI_disarm(filepath):
-    """
-    Select objects that are wrapped (embedded) by other objects and return their ID list
-    :param filepath: Path to the 3D model file
-    :return: A list of object IDs that need to be disarmed (i.e., removed or ignored)
-    """
-    # Locate all object elements and convert them into a dictionary {id: element}
-    objs = fd.get_file_objects(filepath)
-    objects = {obj.attrib.get('id', 'empty'): obj for obj in objs}
-
-    # Locate all item elements
-    items = fd.get_file_items(filepath)
-
-    # Exception handling: objects or items are empty
-    if len(objects) == 0:
-        raise FileNotFoundError
-    if len(items) == 0:
-        raise FileNotFoundError
-
-    # Extract object build info: id and associated transform matrix
-    builds = []
-    for index, item in enumerate(items):
-        builds.append([
-            item.get("objectid", "empty"),
-            item.get("transform", "1 0 0 0 1 0 0 0 1 0 0 0"),
-            index
-        ])
-    build_ids = [l[0] for l in builds]
-    build_trans = [list(map(lambda x: round(float(x), 4), l[1].strip().split())) for l in builds]
-
-    if "empty" in build_ids:
-        # No valid object ID found in build list
-        raise KeyError
-
-    meshes = {}  # Dictionary to hold mesh objects transformed according to build transforms
-    disarms = []  # List of object indices to be disarmed (i.e., objects embedded in others)
-
-    trimeshes = []
-    for ind in range(len(builds)):
-        meshes[ind] = fd.get_transform_mesh(objects[build_ids[ind]], build_trans[ind])
-    for values in meshes.values():
-        trimeshes.append(values)
-
-    disarms = matrix_mosaic_judge(trimeshes)
-
-    return [ind for ind, res in enumerate(disarms) if res == True]  # Return indices of embedded objects
-
-
-def Hollow_Embedding_defense(inputfile, outputfile, mosaic_ids):
-    """
-    Apply Hollow_Embedding defense to inputfile
-
-    :param inputfile: Input file path
-    :param outputfile: Output file path
-    :param mosaic_ids: IDs of objects to be processed
-    """
-    if mosaic_ids is None:
-        raise KeyError("Hollow_Embedding_ids is None")
-
-    # Parse original XML file
-    tree = ET.parse(inputfile)
-    root = tree.getroot()
-
-    to_remove = []
-    for child in root:
-        if strip_namespace(child.tag) == 'build':
-            for index, item in enumerate(child):
-                if index in mosaic_ids:
-                    to_remove.append(item)
-            for delte in to_remove:
-                child.remove(delte)
-        else:
-            pass
-
-    # Convert processed tree to XML file
-    fd.indent(root)
-    new_tree = ET.ElementTree(root)
-    new_tree.write(outputfile, encoding="utf-8", xml_declaration=True)
\ No newline at end of file
+import numpy as np
+import file_handle as fd
+import Voxel_screening_CDR as VS
+import trimesh
+import os
+import re
+import time
+import hashlib
+import shelve
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+
+def strip_namespace(tag):
+    return re.sub(r'\{.*?\}', '', tag)
+
+
+def strlist_calculate(strl1, strl2):
+    # Check if two string lists represent the same set of float values
+    list1 = list(map(float, strl1.strip().split()))
+    list2 = list(map(float, strl2.strip().split()))
+
+    if len(list1) != len(list2):
+        raise Exception('list1 and list2 must have the same length')
+    result = True
+    for i in range(len(list1)):
+        if list1[i] == list2[i]:
+            result = result and True
+        else:
+            result = result and False
+            break
+    return result
+
+
+def contains_points_with_surface(mesh1, points, tolerance=1e-8):
+    # Compute the shortest distance from all points to the mesh surface in one query
+    distances = mesh1.nearest.signed_distance(points)
+    return bool(np.all(np.abs(distances) < tolerance))
+
+
+class TrimeshContainment:
+    """
+    Containment queries through trimesh: ray tests for occupancy, then the exact surface distance
+    for the points that are not strictly inside.
+    """
+    name = "trimesh"
+
+    def __init__(self, mesh):
+        self.mesh = mesh
+
+    def all_inside(self, points, tolerance=1e-8):
+        # True if every point is inside the mesh or within tolerance of its surface
+        ambiguous = points[~self.mesh.contains(points)]
+        return len(ambiguous) == 0 or contains_points_with_surface(self.mesh, ambiguous, tolerance)
+
+    def inside_mask(self, points, tolerance=1e-8):
+        # Boolean array, True for the points inside the mesh or within tolerance of its surface
+        inside = self.mesh.contains(points)
+        ambiguous = ~inside
+        if ambiguous.any():
+            inside[ambiguous] = np.abs(self.mesh.nearest.signed_distance(points[ambiguous])) < tolerance
+        return inside
+
+
+class Open3DContainment:
+    """
+    Containment queries through the CPU RaycastingScene of Open3D: occupancy and unsigned distance
+    are computed for a whole point batch in one call each.
+    The scene works in float32, so every point whose distance to the surface is within the float32
+    error of the mesh scale is handed to TrimeshContainment, which keeps the verdicts identical to
+    the trimesh backend. Containers that are not watertight (where ray parity is not well defined)
+    are always resolved by trimesh.
+    """
+    name = "open3d"
+
+    def __init__(self, mesh):
+        import open3d as o3d  # Optional dependency, only needed for this backend
+
+        self.mesh = mesh
+        self.exact = TrimeshContainment(mesh)
+        self.scene = None
+        if mesh.is_watertight:
+            self.scene = o3d.t.geometry.RaycastingScene()
+            self.scene.add_triangles(
+                o3d.core.Tensor(np.ascontiguousarray(mesh.vertices, dtype=np.float32)),
+                o3d.core.Tensor(np.ascontiguousarray(mesh.faces, dtype=np.uint32)))
+            self.o3d = o3d
+        # Distance error of float32 BVH queries at the scale of the mesh coordinates
+        self.scale = float(np.abs(mesh.bounds).max()) if len(mesh.vertices) else 1.0
+
+    def _near_surface(self, points, tolerance):
+        # float32 copy of the points, and the mask of the points too close to the surface for float32
+        points32 = np.ascontiguousarray(points, dtype=np.float32)
+        distances = self.scene.compute_distance(self.o3d.core.Tensor(points32)).numpy()
+        error = 64 * np.finfo(np.float32).eps * max(self.scale, float(np.abs(points).max()), 1.0)
+        return points32, distances <= tolerance + error
+
+    def all_inside(self, points, tolerance=1e-8):
+        # True if every point is inside the mesh or within tolerance of its surface
+        if self.scene is None:
+            return self.exact.all_inside(points, tolerance)
+
+        points32, near = self._near_surface(points, tolerance)
+
+        # Far from the surface the float32 occupancy is exact
+        far = np.flatnonzero(~near)
+        if len(far) and not np.all(self.scene.compute_occupancy(self.o3d.core.Tensor(points32[far])).numpy() > 0):
+            return False
+        return not near.any() or self.exact.all_inside(points[near], tolerance)
+
+    def inside_mask(self, points, tolerance=1e-8):
+        # Boolean array, True for the points inside the mesh or within tolerance of its surface
+        if self.scene is None:
+            return self.exact.inside_mask(points, tolerance)
+
+        points32, near = self._near_surface(points, tolerance)
+
+        inside = np.zeros(len(points), dtype=bool)
+        far = np.flatnonzero(~near)
+        if len(far):
+            inside[far] = self.scene.compute_occupancy(self.o3d.core.Tensor(points32[far])).numpy() > 0
+        if near.any():
+            inside[near] = self.exact.inside_mask(points[near], tolerance)
+        return inside
+
+
+CONTAINMENT_BACKENDS = {
+    "trimesh": TrimeshContainment,
+}
+
+# Backends whose verdict parity and speed have not been measured on real models yet: they are only
+# selectable with experimental=True (benchmark_backends compares them with the trimesh backend)
+EXPERIMENTAL_BACKENDS = {
+    "open3d": Open3DContainment,
+}
+
+
+def check_backend(backend, experimental=False):
+    """
+    Validate a containment backend name before any mesh is prepared.
+    :param backend: Backend name, or an already prepared backend object
+    :param experimental: Allow the backends of EXPERIMENTAL_BACKENDS
+    :raises ValueError: If the backend is unknown, or experimental while experimental is False
+    """
+    if not isinstance(backend, str) or backend in CONTAINMENT_BACKENDS:
+        return
+    if backend not in EXPERIMENTAL_BACKENDS:
+        raise ValueError("Unknown containment backend: %s" % backend)
+    if not experimental:
+        raise ValueError("Containment backend %s is experimental, pass experimental=True to use it" % backend)
+
+
+def containment_backend(mesh, backend="trimesh"):
+    """
+    Prepare the containment queries of a mesh.
+    :param mesh: trimesh object
+    :param backend: Backend name (see CONTAINMENT_BACKENDS and EXPERIMENTAL_BACKENDS), or an already
+                    prepared backend object
+    :return: Backend object with an all_inside(points, tolerance) method
+    """
+    if not isinstance(backend, str):
+        return backend
+    if backend in CONTAINMENT_BACKENDS:
+        return CONTAINMENT_BACKENDS[backend](mesh)
+    if backend in EXPERIMENTAL_BACKENDS:
+        return EXPERIMENTAL_BACKENDS[backend](mesh)
+    raise ValueError("Unknown containment backend: %s" % backend)
+
+
+def stratified_sample(vertices, sample_size=32):
+    """
+    Pick a cheap, spread-out subset of vertices: the extreme vertex along each axis (the most likely
+    to stick out of a container) plus vertices evenly spaced over the vertex list.
+    :param vertices: float array (N, 3)
+    :param sample_size: Number of evenly spaced vertices
+    :return: Sorted unique indices into vertices
+    """
+    extremes = np.concatenate([vertices.argmin(axis=0), vertices.argmax(axis=0)])
+    spaced = np.linspace(0, len(vertices) - 1, min(sample_size, len(vertices))).astype(np.int64)
+    return np.unique(np.concatenate([extremes, spaced]))
+
+
+def contains_points(mesh1, points, sample_size=32, tolerance=1e-8, backend="trimesh"):
+    # Determine whether all points are inside mesh1 or on its surface
+
+    # A stratified sample is tested first so that the common non-embedded case is rejected
+    # after one small batched query
+    if len(points) == 0:
+        return True
+    query = containment_backend(mesh1, backend)
+    sample = stratified_sample(points, sample_size)
+    rest = np.ones(len(points), dtype=bool)
+    rest[sample] = False
+
+    for batch in (points[sample], points[rest]):
+        if len(batch) == 0:
+            continue
+        if not query.all_inside(batch, tolerance):
+            return False
+    return True
+
+
+def contains_meshes(mesh1, mesh2, sample_size=32, tolerance=1e-8, backend="trimesh"):
+    # Determine whether mesh1 contains mesh2: all vertices of mesh2 must be inside mesh1 or on its surface
+    return contains_points(mesh1, np.asarray(mesh2.vertices), sample_size, tolerance, backend)
+
+
+def contains_instance(mesh1, matrix1, mesh2, matrix2, sample_size=32, tolerance=1e-8, backend="trimesh"):
+    """
+    Determine whether instance 1 (mesh1 placed with matrix1) contains instance 2.
+    Both meshes stay in local space: the vertices of mesh2 are mapped into the frame of mesh1 by
+    inverse(matrix1) @ matrix2, so mesh1 keeps the ray and proximity structures it already built.
+    :param mesh1, mesh2: Local-space trimesh objects
+    :param matrix1, matrix2: 4x4 instance transforms
+    :param backend: Containment backend name, or the prepared backend of mesh1
+    :return: True if instance 1 contains instance 2
+    """
+    try:
+        inverse = np.linalg.inv(matrix1)
+    except np.linalg.LinAlgError:
+        # Degenerate container transform: fall back to a world-space copy of the container
+        world = trimesh.Trimesh(vertices=fd.apply_transform_array(np.asarray(mesh1.vertices), matrix1),
+                                faces=mesh1.faces, process=False)
+        return contains_points(world, fd.apply_transform_array(np.asarray(mesh2.vertices), matrix2),
+                               sample_size, tolerance, getattr(backend, 'name', backend))
+
+    # Distances shrink by at most the largest scale factor of the container transform
+    scale = np.linalg.norm(matrix1[:3, :3], ord=2)
+    points = fd.apply_transform_array(np.asarray(mesh2.vertices), inverse @ matrix2)
+    return contains_points(mesh1, points, sample_size, tolerance / scale if scale > 0 else tolerance, backend)
+
+
+def contains_parts(container, contained, meshes, queries, backend="trimesh", sample_size=32, tolerance=1e-8):
+    """
+    Determine whether an assembly contains another one. An assembly is the list of (mesh key, 4x4
+    matrix) instances of a build item; a point counts as inside the container if it is inside (or
+    on the surface of) any of its instances.
+    :param container, contained: Lists of (mesh key, 4x4 matrix)
+    :param meshes: Mapping {mesh key: local-space trimesh}
+    :param queries: Dictionary {mesh key: prepared containment backend}, filled on demand
+    :param backend: Containment backend name used for the meshes missing from queries
+    :return: True if the container assembly contains every vertex of the contained assembly
+    """
+    for key, _ in container:
+        if key not in queries:
+            queries[key] = containment_backend(meshes[key], backend)
+    if len(container) == 1 and len(contained) == 1:
+        # Single meshes: test in the local frame of the container directly
+        (key1, matrix1), (key2, matrix2) = container[0], contained[0]
+        return contains_instance(meshes[key1], matrix1, meshes[key2], matrix2, sample_size, tolerance,
+                                 queries[key1])
+
+    # Frame of every container instance: (backend, world to local matrix, local tolerance)
+    frames = []
+    for key, matrix in container:
+        try:
+            inverse = np.linalg.inv(matrix)
+            query = queries[key]
+        except np.linalg.LinAlgError:
+            inverse = np.eye(4)
+            world = trimesh.Trimesh(vertices=fd.apply_transform_array(np.asarray(meshes[key].vertices), matrix),
+                                    faces=meshes[key].faces, process=False)
+            query = containment_backend(world, backend)
+            matrix = np.eye(4)
+        scale = np.linalg.norm(matrix[:3, :3], ord=2)
+        frames.append((query, inverse, tolerance / scale if scale > 0 else tolerance))
+
+    points = np.concatenate([fd.apply_transform_array(np.asarray(meshes[key].vertices), matrix)
+                             for key, matrix in contained])
+    if len(points) == 0:
+        return True
+    sample = stratified_sample(points, sample_size)
+    rest = np.ones(len(points), dtype=bool)
+    rest[sample] = False
+
+    for remaining in (points[sample], points[rest]):
+        # Points inside one instance are removed before the next instance is queried
+        for query, inverse, local_tolerance in frames:
+            if len(remaining) == 0:
+                break
+            inside = query.inside_mask(fd.apply_transform_array(remaining, inverse), local_tolerance)
+            remaining = remaining[~inside]
+        if len(remaining):
+            return False
+    return True
+
+
+def extreme_vertices(mesh):
+    """
+    Vertices that define the bounding box of the mesh under any affine transform: the vertices of
+    the convex hull when it can be built, all vertices otherwise.
+    """
+    try:
+        return np.asarray(mesh.convex_hull.vertices)
+    except Exception:
+        return np.asarray(mesh.vertices)
+
+
+def broad_phase_pairs(bounds, tolerance=1e-8):
+    """
+    Broad phase of the containment matrix: sweep-and-prune over world-space AABBs.
+    Boxes are sorted on their minimum x; for each box only the boxes whose minimum x falls inside
+    its x interval are considered, and a pair (i, j) survives only if the box of j lies inside the
+    box of i. A container therefore always has the larger (or equal) box volume, so each pair is
+    tested in the direction of the larger candidate only.
+    :param bounds: float array (n, 2, 3) of [min corner, max corner] per object
+    :param tolerance: Slack on the boxes, the same as the surface tolerance of the exact test
+    :return: List of (container index, contained index) pairs to test exactly
+    """
+    mins, maxs = bounds[:, 0], bounds[:, 1]
+    order = np.argsort(mins[:, 0], kind="stable")
+    sorted_min_x = mins[order, 0]
+    low = np.searchsorted(sorted_min_x, mins[:, 0] - tolerance, side="left")
+    high = np.searchsorted(sorted_min_x, maxs[:, 0] + tolerance, side="right")
+
+    pairs = []
+    for i in range(len(bounds)):
+        candidates = order[low[i]:high[i]]
+        candidates = candidates[candidates != i]
+        inside = np.all(mins[candidates] >= mins[i] - tolerance, axis=1) & \
+                 np.all(maxs[candidates] <= maxs[i] + tolerance, axis=1)
+        pairs.extend((i, int(j)) for j in candidates[inside])
+    return pairs
+
+
+class ContainmentMemo:
+    """
+    Memo of containment verdicts: whether an assembly contains another one only depends on their
+    meshes and on their transforms relative to each other, so a verdict is stored under
+    (mesh fingerprints, quantized relative transforms, tolerance) and reused by every pair, and
+    every file, that repeats the same arrangement.
+    Verdicts are kept in a bounded in-memory LRU, and optionally in a shelve file on disk.
+    The memo never holds a mesh: keys only contain fingerprints, computed by the caller for the
+    duration of one judgement.
+    """
+
+    def __init__(self, max_entries=100000, path=None, quantum=1e-9):
+        """
+        :param max_entries: Number of verdicts kept in memory
+        :param path: Optional shelve file for the on-disk tier
+        :param quantum: Grid step of the relative transforms and of the mesh fingerprints
+        """
+        self.max_entries = max_entries
+        self.path = path
+        self.quantum = quantum
+        self.entries = OrderedDict()
+        self.disk = None
+        self.hits = self.disk_hits = self.misses = 0
+
+    def fingerprint(self, mesh):
+        # Fingerprint of a mesh, on the grid of the memo (not cached: the memo keeps no mesh alive)
+        return fd.mesh_fingerprint(np.asarray(mesh.vertices), np.asarray(mesh.faces), self.quantum)
+
+    def pair_key(self, container, contained, fingerprints, tolerance=1e-8):
+        """
+        Memo key of a pair of assemblies, lists of (mesh key, 4x4 matrix); transforms are expressed
+        in the frame of the first container instance.
+        :param fingerprints: Mapping {mesh key: fingerprint} (see fingerprint)
+        :return: Key tuple, or None if that frame is degenerate
+        """
+        try:
+            inverse = np.linalg.inv(container[0][1])
+        except np.linalg.LinAlgError:
+            return None
+
+        def relative(parts):
+            return tuple(sorted(
+                (fingerprints[key],
+                 tuple(np.round((inverse @ matrix)[:3].ravel() / self.quantum).astype(np.int64).tolist()))
+                for key, matrix in parts))
+
+        return relative(container), relative(contained), tolerance
+
+    def _disk_key(self, key):
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def _open_disk(self):
+        if self.disk is None and self.path is not None:
+            self.disk = shelve.open(self.path)
+        return self.disk
+
+    def get(self, key):
+        """
+        :return: Stored verdict, or None if the key is unknown
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        disk = self._open_disk()
+        if disk is not None:
+            verdict = disk.get(self._disk_key(key))
+            if verdict is not None:
+                self.disk_hits += 1
+                self._remember(key, verdict)
+                return verdict
+        self.misses += 1
+        return None
+
+    def put(self, key, verdict):
+        self._remember(key, bool(verdict))
+        disk = self._open_disk()
+        if disk is not None:
+            disk[self._disk_key(key)] = bool(verdict)
+
+    def _remember(self, key, verdict):
+        self.entries[key] = verdict
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
+
+
+class MeshFingerprints(dict):
+    """
+    Fingerprints of the meshes of one instance_mosaic_judge call, computed on first use and released
+    with the call.
+    """
+
+    def __init__(self, meshes, memo):
+        super().__init__()
+        self.meshes = meshes
+        self.memo = memo
+
+    def __missing__(self, key):
+        self[key] = self.memo.fingerprint(self.meshes[key])
+        return self[key]
+
+
+# Memo shared by every call of instance_mosaic_judge that does not pass its own
+CONTAINMENT_MEMO = ContainmentMemo()
+
+
+# Worker-side state of the process pool: shared arrays and the meshes rebuilt from them
+_worker_state = {}
+
+
+def share_meshes(trimeshes):
+    """
+    Copy the vertex and face arrays of all meshes into two shared memory blocks, once.
+    :param trimeshes: List of trimesh objects
+    :return: (list of SharedMemory blocks to release, layout tuple passed to the workers)
+    """
+    vertices = np.concatenate([np.asarray(mesh.vertices, dtype=np.float64) for mesh in trimeshes])
+    faces = np.concatenate([np.asarray(mesh.faces, dtype=np.int64) for mesh in trimeshes])
+    vertex_offsets = np.cumsum([0] + [len(mesh.vertices) for mesh in trimeshes]).tolist()
+    face_offsets = np.cumsum([0] + [len(mesh.faces) for mesh in trimeshes]).tolist()
+
+    blocks, layout = [], []
+    for array in (vertices, faces):
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        blocks.append(block)
+        layout.append((block.name, array.shape, array.dtype.str))
+    return blocks, (layout, vertex_offsets, face_offsets)
+
+
+def _attach_meshes(layout, vertex_offsets, face_offsets, backend="trimesh"):
+    # Process pool initializer: map the shared arrays without copying them
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in layout]
+    arrays = [np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+              for block, (_, shape, dtype) in zip(blocks, layout)]
+    _worker_state.update(blocks=blocks, vertices=arrays[0], faces=arrays[1],
+                         vertex_offsets=vertex_offsets, face_offsets=face_offsets, meshes={},
+                         backend=backend, queries={})
+
+
+def _worker_mesh(index):
+    # Rebuild a mesh from the shared arrays once per worker (process=False keeps the vertices as shared)
+    meshes = _worker_state['meshes']
+    if index not in meshes:
+        vertex_offsets, face_offsets = _worker_state['vertex_offsets'], _worker_state['face_offsets']
+        meshes[index] = trimesh.Trimesh(
+            vertices=_worker_state['vertices'][vertex_offsets[index]:vertex_offsets[index + 1]],
+            faces=_worker_state['faces'][face_offsets[index]:face_offsets[index + 1]],
+            process=False)
+    return meshes[index]
+
+
+def _worker_query(index):
+    # Prepare the containment backend of a mesh once per worker
+    queries = _worker_state['queries']
+    if index not in queries:
+        queries[index] = containment_backend(_worker_mesh(index), _worker_state['backend'])
+    return queries[index]
+
+
+def _contains_pairs(tasks):
+    # Process pool task: exact containment test of a chunk of assembly pairs
+    results = []
+    for container, contained, parts1, parts2 in tasks:
+        meshes = {index: _worker_mesh(index) for index, _ in parts1 + parts2}
+        results.append((container, contained,
+                        contains_parts(parts1, parts2, meshes, _worker_state['queries'], _worker_state['backend'])))
+    return results
+
+
+def parallel_mosaic_pairs(trimeshes, tasks, workers, backend="trimesh"):
+    """
+    Run contains_parts on candidate pairs in a pool of worker processes.
+    Each distinct mesh is placed in shared memory once; tasks are chunked in order (sorted by
+    container) so every worker rebuilds as few meshes as possible.
+    :param trimeshes: List of the distinct local-space trimesh objects
+    :param tasks: List of (container, contained, container parts, contained parts), the parts being
+                  lists of (mesh index, 4x4 matrix)
+    :param workers: Number of worker processes
+    :param backend: Containment backend name
+    :return: List of the (container, contained) pairs where containment holds
+    """
+    chunk = max(1, -(-len(tasks) // (workers * 4)))
+    chunks = [tasks[start:start + chunk] for start in range(0, len(tasks), chunk)]
+
+    blocks, layout = share_meshes(trimeshes)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_meshes,
+                                 initargs=layout + (backend,)) as pool:
+            return [(container, contained) for results in pool.map(_contains_pairs, chunks)
+                    for container, contained, inside in results if inside]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def instance_mosaic_judge(meshes, instances, report=None, workers=1, min_parallel_pairs=64, backend="trimesh",
+                          voxel_resolution=None, memo=None, experimental=False):
+    """
+    Determine embedding between instanced objects using a matrix-based method:
+    - Each distinct mesh is kept once, in local space; a build item is an assembly of instances
+      (mesh key, 4x4 transform), a single one for a plain mesh object
+    - A broad phase on world-space bounding boxes (broad_phase_pairs) drops every pair that cannot
+      be nested; optionally, voxel screening (Voxel_screening_CDR.screen_pairs) drops the pairs
+      whose occupancy grids already rule containment out; contains_parts only runs on the rest
+    - Diagonal entries are never tested (an object cannot contain itself)
+    - A logical OR over each column tells whether an item is embedded in another one;
+      once a column is True its remaining pairs are skipped (serial mode)
+    - Verdicts are looked up in and stored to a ContainmentMemo, so repeated arrangements are
+      tested once
+    :param meshes: Dictionary {mesh key: local-space trimesh or None}
+    :param instances: List with one entry per build item: list of (mesh key, 4x4 matrix)
+    :param report: Optional dictionary, filled with 'pairs_total', 'pairs_pruned', 'pairs_tested',
+                   'workers', 'meshes' and 'instances'; with voxel screening also the entries of
+                   screen_pairs, 'voxel_false_positive_rate' (share of the tested candidates that
+                   are not contained) and 'voxel_time_saved' (rejected pairs times the mean time of a
+                   negative exact test, minus the screening time, in seconds), and 'memo_hits'
+                   (pairs answered by the memo)
+    :param workers: Number of worker processes for the exact tests (None: one per CPU, 1: serial)
+    :param min_parallel_pairs: Below this number of surviving pairs the tests run serially
+    :param backend: Containment backend name ("trimesh", or "open3d" with experimental=True)
+    :param voxel_resolution: Voxels along the longest axis for the screening, None to disable it
+    :param memo: ContainmentMemo to use (None: the module's CONTAINMENT_MEMO, False: no memo)
+    :param experimental: Allow the backends of EXPERIMENTAL_BACKENDS
+    :return: List of booleans, True where the item is contained by another one
+    """
+    check_backend(backend, experimental)
+    count = len(instances)
+    # Instances without a mesh are ignored, and so are the items left without any instance
+    assemblies = [[(key, matrix) for key, matrix in parts if meshes.get(key) is not None] for parts in instances]
+    valid = [ind for ind, parts in enumerate(assemblies) if len(parts)]
+    extremes = {}
+    bounds = np.zeros((len(valid), 2, 3))
+    for position, ind in enumerate(valid):
+        corners = []
+        for key, matrix in assemblies[ind]:
+            if key not in extremes:
+                extremes[key] = extreme_vertices(meshes[key])
+            corners.append(fd.apply_transform_array(extremes[key], matrix))
+        world = np.concatenate(corners)
+        bounds[position] = world.min(axis=0), world.max(axis=0)
+    pairs = [(valid[container], valid[contained]) for container, contained in broad_phase_pairs(bounds)]
+    pruned = count * (count - 1) - len(pairs)
+    if voxel_resolution is not None:
+        pairs = VS.screen_pairs(meshes, assemblies, pairs, voxel_resolution, report)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if memo is None:
+        memo = CONTAINMENT_MEMO
+    hits = 0
+
+    fingerprints = MeshFingerprints(meshes, memo) if memo else None
+
+    def memo_key(container, contained):
+        return memo.pair_key(assemblies[container], assemblies[contained], fingerprints) if memo else None
+
+    judge_list = [False] * count  # Initialize result list
+    if workers > 1 and len(pairs) >= min_parallel_pairs:
+        # Answer what the memo knows, send only the unknown pairs to the pool
+        pending = []
+        for container, contained in pairs:
+            key = memo_key(container, contained)
+            verdict = None if key is None else memo.get(key)
+            if verdict is None:
+                pending.append((container, contained, key))
+            else:
+                hits += 1
+                judge_list[contained] = judge_list[contained] or verdict
+        pairs = [(container, contained) for container, contained, _ in pending]
+    if workers > 1 and len(pairs) >= min_parallel_pairs:
+        keys = sorted({key for ind in valid for key, _ in assemblies[ind]}, key=str)
+        key_index = {key: position for position, key in enumerate(keys)}
+        indexed = {ind: [(key_index[key], matrix) for key, matrix in assemblies[ind]] for ind in valid}
+        tasks = [(container, contained, indexed[container], indexed[contained])
+                 for container, contained in sorted(pairs)]
+        start = time.perf_counter()
+        found = parallel_mosaic_pairs([meshes[key] for key in keys], tasks, workers, backend)
+        for container, contained in found:
+            judge_list[contained] = True
+        found_set = set(found)
+        for container, contained, key in pending:
+            if key is not None:
+                memo.put(key, (container, contained) in found_set)
+        tested, positives = len(pairs), len(found)
+        negative_time = (time.perf_counter() - start) * (tested - positives) / max(tested, 1)
+    else:
+        workers = 1
+        tested = positives = 0
+        negative_time = 0.0
+        queries = {}  # Containment backend prepared once per container mesh
+        for container, contained in pairs:
+            if judge_list[contained]:
+                continue  # Already known to be embedded in another object
+            key = memo_key(container, contained)
+            verdict = None if key is None else memo.get(key)
+            if verdict is not None:
+                hits += 1
+                judge_list[contained] = verdict
+                continue
+            tested += 1
+            pair_start = time.perf_counter()
+            verdict = contains_parts(assemblies[container], assemblies[contained], meshes, queries, backend)
+            if key is not None:
+                memo.put(key, verdict)
+            if verdict:
+                judge_list[contained] = True
+                positives += 1
+            else:
+                negative_time += time.perf_counter() - pair_start
+
+    if report is not None:
+        report['pairs_total'] = count * (count - 1)
+        report['pairs_pruned'] = pruned
+        report['pairs_tested'] = tested
+        report['workers'] = workers
+        report['meshes'] = len({key for ind in valid for key, _ in assemblies[ind]})
+        report['instances'] = sum(len(assemblies[ind]) for ind in valid)
+        report['memo_hits'] = hits
+        if voxel_resolution is not None:
+            report['voxel_false_positive_rate'] = (tested - positives) / tested if tested else 0.0
+            negatives = tested - positives
+            report['voxel_time_saved'] = report['voxel_rejected'] * (negative_time / negatives if negatives else 0.0) - \
+                report['voxel_time']
+
+    return judge_list  # Return the list of containment results
+
+
+def matrix_mosaic_judge(trimeshes, report=None, workers=1, min_parallel_pairs=64, backend="trimesh", memo=None,
+                        experimental=False):
+    """
+    Determine embedding using a matrix-based method on already placed meshes
+    (see instance_mosaic_judge; every mesh is its own instance with an identity transform).
+    :param trimeshes: List of trimesh objects (None entries, e.g. objects without a mesh, are ignored)
+    :param report: Optional dictionary receiving the statistics of instance_mosaic_judge
+    :param workers: Number of worker processes for the exact tests (None: one per CPU, 1: serial)
+    :param min_parallel_pairs: Below this number of surviving pairs the tests run serially
+    :param backend: Containment backend name ("trimesh", or "open3d" with experimental=True)
+    :param memo: ContainmentMemo to use (None: the module's CONTAINMENT_MEMO, False: no memo)
+    :param experimental: Allow the backends of EXPERIMENTAL_BACKENDS
+    :return: List of booleans indicating whether each object is contained by others (True if contained)
+    """
+    meshes = dict(enumerate(trimeshes))
+    instances = [[(ind, np.eye(4))] for ind in range(len(trimeshes))]
+    return instance_mosaic_judge(meshes, instances, report, workers, min_parallel_pairs, backend, memo=memo,
+                                 experimental=experimental)
+
+
+def UI_disarm(filepath, report=None, workers=1, backend="trimesh", skip=None, voxel_resolution=None, memo=None,
+              experimental=False):
+    """
+    Select objects that are wrapped (embedded) by other objects and return their ID list
+    Each distinct mesh object is parsed and turned into a local-space mesh once, however many build
+    items or components place it; its ray and proximity structures are then shared by all its
+    instances. Build items are flattened with file_handle.resolve_build_instances.
+    :param filepath: Path to the 3D model file, the model content as bytes, or a ModelDocument
+    :param report: Optional dictionary receiving the statistics of instance_mosaic_judge
+    :param workers: Number of worker processes for the containment matrix (None: one per CPU)
+    :param backend: Containment backend: "trimesh" (default), or the experimental "open3d" (requires the
+                    open3d package and experimental=True)
+    :param skip: Optional build item indexes left out of the matrix (e.g. already removed by another defense)
+    :param voxel_resolution: Optional voxel screening resolution (see Voxel_screening_CDR.screen_pairs)
+    :param memo: ContainmentMemo to use (None: the module's CONTAINMENT_MEMO, False: no memo)
+    :param experimental: Allow the backends of EXPERIMENTAL_BACKENDS
+    :return: A list of object IDs that need to be disarmed (i.e., removed or ignored)
+    """
+    # Parse once: objects as a dictionary {id: element} and all item elements
+    doc = fd.as_model_document(filepath)
+    objects = doc.objects
+    items = doc.items
+
+    # Exception handling: objects or items are empty
+    if len(objects) == 0:
+        raise FileNotFoundError
+    if len(items) == 0:
+        raise FileNotFoundError
+
+    # Extract object build info: id of each item
+    build_ids = [l[0] for l in doc.builds]
+
+    if "empty" in build_ids:
+        # No valid object ID found in build list
+        raise KeyError
+
+    # List of (mesh object id, world matrix) per build item, the build transforms rounded to 4 decimals;
+    # builds whose component hierarchy expands too far are rejected before any matrix is composed
+    instances = fd.resolve_build_instances(doc, skip=skip, decimals=4)
+
+    meshes = {}  # Dictionary holding one local-space mesh per distinct mesh object id
+    for parts in instances:
+        for mesh_id, _ in parts:
+            if mesh_id not in meshes:
+                meshes[mesh_id] = doc.get_transform_mesh(mesh_id, np.eye(4))
+
+    disarms = instance_mosaic_judge(meshes, instances, report, workers, backend=backend,
+                                    voxel_resolution=voxel_resolution, memo=memo, experimental=experimental)
+
+    return [ind for ind, res in enumerate(disarms) if res == True]  # Return indices of embedded objects
+
+
+def benchmark_backends(filepaths, backends=("trimesh", "open3d"), workers=1):
+    """
+    Run UI_disarm on every file with each containment backend and compare time and verdicts; this is the
+    tool that decides whether an experimental backend can leave EXPERIMENTAL_BACKENDS
+    :param filepaths: List of model file paths (or model contents as bytes)
+    :param backends: Backend names to compare; the first one is the reference
+    :param workers: Number of worker processes passed to UI_disarm
+    :return: Dictionary {backend: {'time': total seconds, 'mismatches': files whose verdict differs
+             from the reference backend}}
+    """
+    verdicts = {}
+    results = {}
+    for backend in backends:
+        elapsed = 0.0
+        verdicts[backend] = []
+        for filepath in filepaths:
+            doc = fd.as_model_document(filepath)
+            start = time.perf_counter()
+            try:
+                verdicts[backend].append(UI_disarm(doc, workers=workers, backend=backend, memo=False,
+                                                   experimental=True))
+            except (FileNotFoundError, KeyError) as e:
+                verdicts[backend].append(type(e).__name__)
+            elapsed += time.perf_counter() - start
+        results[backend] = {'time': elapsed}
+
+    reference = verdicts[backends[0]]
+    for backend in backends:
+        results[backend]['mismatches'] = [filepaths[ind] for ind, verdict in enumerate(verdicts[backend])
+                                          if verdict != reference[ind]]
+    return results
+
+
+def Hollow_Embedding_defense(inputfile, outputfile, mosaic_ids):
+    """
+    Apply Hollow_Embedding defense to inputfile
+
+    :param inputfile: Input file path, the model content as bytes, or a ModelDocument (modified in place)
+    :param outputfile: Output file path
+    :param mosaic_ids: IDs of objects to be processed
+    """
+    if mosaic_ids is None:
+        raise KeyError("Hollow_Embedding_ids is None")
+
+    doc = fd.as_model_document(inputfile)
+    root = doc.root
+
+    to_remove = []
+    for child in root:
+        if strip_namespace(child.tag) == 'build':
+            for index, item in enumerate(child):
+                if index in mosaic_ids:
+                    to_remove.append(item)
+            for delte in to_remove:
+                child.remove(delte)
+        else:
+            pass
+
+    # Convert processed tree to XML file
+    doc.reindex()
+    doc.write(outputfile)
@@ -0,0 +1,105 @@
+import numpy as np
+import file_handle as fd
+
+
+def first_occurrences(keys):
+    """
+    Indices of the first occurrence of every distinct value of a 1-D array.
+
+    :param keys: 1-D array
+    :return: int array of indices, one per distinct value
+    """
+    order = np.argsort(keys)
+    ordered = keys[order]
+    starts = np.flatnonzero(np.concatenate([[True], ordered[1:] != ordered[:-1]]))
+    return np.minimum.reduceat(order, starts)
+
+
+def coordinate_ids(vertices):
+    """
+    Give every distinct coordinate one id, so that distinct vertex indices pointing at
+    identical coordinates compare equal.
+    Rows are grouped on a 64-bit hash and checked against their neighbour, so a hash collision
+    can only split a coordinate into two ids, never merge two different coordinates.
+
+    :param vertices: float64 array (N, 3)
+    :return: int64 array (N,) of coordinate ids
+    """
+    if len(vertices) == 0:
+        return np.zeros(0, dtype=np.int64)
+    # + 0.0 turns -0.0 into 0.0 so that equal floats have equal bits
+    bits = np.ascontiguousarray(vertices + 0.0).view(np.int64)
+    hashes = fd.hash_rows(bits)
+    order = np.argsort(hashes)
+    ordered = bits[order]
+    new_coordinate = np.ones(len(vertices), dtype=bool)
+    new_coordinate[1:] = (hashes[order][1:] != hashes[order][:-1]) | np.any(ordered[1:] != ordered[:-1], axis=1)
+    ids = np.empty(len(vertices), dtype=np.int64)
+    ids[order] = np.cumsum(new_coordinate) - 1
+    return ids
+
+
+def find_unique_triangles(vertices, triangles):
+    """
+    Find the first occurrence of every triangle of one mesh.
+    Triangles are compared on their coordinates and rotated so that the vertex order does not
+    matter as long as the winding is the same ([a, b, c] == [b, c, a] == [c, a, b]).
+
+    :param vertices: float64 array (N, 3)
+    :param triangles: int array (M, 3)
+    :return: Boolean array (M,), True for the triangles to keep
+    """
+    keep = np.zeros(len(triangles), dtype=bool)
+    if len(triangles) == 0:
+        return keep
+
+    ids = coordinate_ids(vertices)[triangles]
+    a, b, c = ids[:, 0], ids[:, 1], ids[:, 2]
+
+    if ids.max(initial=0) < (1 << 21):
+        # Pack the three ids into one int64 key; the smallest of the three rotations is the
+        # rotation starting with the smallest id, which makes the key rotation invariant
+        keys = np.minimum(np.minimum((a << 42) | (b << 21) | c, (b << 42) | (c << 21) | a),
+                          (c << 42) | (a << 21) | b)
+        keep[first_occurrences(keys)] = True
+    else:
+        start = np.argmin(ids, axis=1)
+        ids = np.take_along_axis(ids, (start[:, None] + np.arange(3)) % 3, axis=1)
+        _, first = np.unique(ids, axis=0, return_index=True)
+        keep[first] = True
+    return keep
+
+
+def Model_overlap_dection(input_file, workers=1):
+    """
+    Detect model overlap attacks inside the meshes of a 3mf model: triangles repeated within one object
+
+    :param input_file: Path to the model file, the model content as bytes, or a ModelDocument
+    :param workers: Number of worker processes (1: sequential, None: one per CPU), see file_handle.map_mesh_objects
+    :return: Dictionary {object id: keep mask} for the objects that contain duplicate triangles
+    """
+    doc = fd.as_model_document(input_file)
+
+    masks = fd.map_mesh_objects(doc, find_unique_triangles, workers)
+    return {obj_id: keep for obj_id, keep in masks.items() if not keep.all()}
+
+
+def Model_overlap_defense(input_file, output_file, overlaps=None):
+    """
+    Remove the duplicate triangles of every object and write the model to output_file
+    A ModelDocument passed as input_file is modified in place.
+
+    :param input_file: Path to the model file, the model content as bytes, or a ModelDocument
+    :param output_file: Output path or file object
+    :param overlaps: Optional result of Model_overlap_dection, computed when not given
+    """
+    doc = fd.as_model_document(input_file)
+    if overlaps is None:
+        overlaps = Model_overlap_dection(doc)
+    if len(overlaps) == 0:
+        raise EOFError
+
+    for obj_id, keep in overlaps.items():
+        doc.keep_triangles(obj_id, keep)
+
+    doc.write(output_file)
@@ -1,200 +1,257 @@
-import xml.etree.ElementTree as ET
-import copy
-
-def equal_point(point1, point2):
-    """
-    Determine whether two points (in 3D coordinate space) are the same.
-    Returns True if they are the same, otherwise returns False.
-    :param point1: The first point, format [x1, y1, z1]
-    :param point2: The second point, format [x2, y2, z2]
-    :return: Comparison result. If the coordinates are exactly the same (including order), return True; otherwise, False.
-    """
-    # If the coordinate lengths differ, return False
-    if len(point1) != len(point2):
-        return False
-    else:
-        length = len(point1)
-        for ind in range(length):  # Traverse both point arrays and compare element-wise
-            if point1[ind] != point2[ind]:
-                return False
-        return True  # Return True if all coordinates match
-
-def seq_point(point1, point2):
-    """
-    Select the more 'standardized' point from point1 and point2.
-    The selection rules are as follows:
-    1. Compare the sum of x + y + z. The one with the larger sum is more standardized.
-        2. If equal, compare the x coordinate. The smaller one is more standardized.
-            3. If equal, compare the y coordinate. The smaller one is more standardized.
-                4. If equal, compare the z coordinate. The smaller one is more standardized.
-    These rules are sequential: only proceed to the next if the current condition doesn't determine the result.
-    Note: In theory, the same coordinates for both points should not happen. Such overlap is considered invalid (not discussed here).
-    :param point1: First point [x1, y1, z1]
-    :param point2: Second point [x2, y2, z2]
-    :return: The point that best matches the rule
-    """
-
-    # Check if the coordinate dimensions match
-    if len(point1) != len(point2):
-        raise EOFError
-
-    # Compute sum of coordinates and return the one with the greater sum
-    sum1, sum2 = sum(point1), sum(point2)
-    if sum1 > sum2:
-        return point1
-    elif sum2 > sum1:
-        return point2
-    else:
-        # If sums are equal, compare x, y, z coordinates in order
-        if point1[0] < point2[0]:
-            return point1
-        elif point1[0] > point2[0]:
-            return point2
-        else:
-            if point1[1] < point2[1]:
-                return point1
-            elif point1[1] > point2[1]:
-                return point2
-            else:
-                if point1[2] < point2[2]:
-                    return point1
-                elif point1[2] > point2[2]:
-                    return point2
-                else:
-                    raise EOFError("The input points have identical coordinates")
-
-def Decode(modelpath):
-    """
-    Decode the model file and extract triangle point sets from object elements.
-    According to the rule in seq_point, determine whether triangle[0] is the most standardized point.
-    If triangle[0] is the most standardized, encode as 1; otherwise, encode as 0.
-    Return the final binary array as the decoding result of the model file.
-    """
-    # Load model file information
-    tree = ET.parse(modelpath)
-    root = tree.getroot()
-
-    # Define the result list
-    result = []
-
-    # Define the namespace
-    namespaces = {
-        '': 'http://schemas.microsoft.com/3dmanufacturing/core/2015/02'
-    }
-
-    # Extract object elements
-    objs = root.findall('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}object')
-
-    # Iterate over objects for encoding
-    for obj in objs:
-        # Get mesh object
-        mesh = obj.find('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}mesh')
-        if mesh is not None:
-            # Get vertex list in 3D coordinate format (order matters)
-            Vertices = mesh.findall('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}vertex')
-            vertices = []
-            for vertex in Vertices:
-                x = float(vertex.attrib.get('x'))
-                y = float(vertex.attrib.get('y'))
-                z = float(vertex.attrib.get('z'))
-                vertice = [x, y, z]
-                vertices.append(vertice)
-
-            # Get triangle elements as index sequences, e.g., [0,1,2], [3,1,2]
-            Triangles = mesh.findall('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}triangle')
-
-            for triangle in Triangles:  # Iterate over triangles
-                # Convert triangle to 3D coordinate format, shape 3x3
-                triangle_points = [vertices[int(triangle.attrib.get(index))] for index in ["v1", "v2", "v3"]]
-                # Determine whether triangle[0] is the most standardized and encode accordingly
-                res = equal_point(triangle_points[0],
-                                  seq_point(triangle_points[0], seq_point(triangle_points[1], triangle_points[2])))
-                result.append(int(res))
-    return result
-
-def Steg_basic_CDR(modelpath, defense_model):
-    """
-    Apply countermeasure for Steg attack: remove and reconstruct content.
-    This modifies all triangle encodings in the model file to 1 to destroy steganographic information.
-    The encoding rule is: triangle[0] is the most standardized point => encode as 1.
-    See the `seq_point` function for the definition of "most standardized".
-    """
-
-    # Load model file information
-    tree = ET.parse(modelpath)
-    root = tree.getroot()
-
-    # Define the namespace
-    namespaces = {
-        '': 'http://schemas.microsoft.com/3dmanufacturing/core/2015/02'
-    }
-
-    # Extract object elements
-    objs = root.findall('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}object')
-
-    for obj in objs:  # Iterate over object elements
-        mesh = obj.find('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}mesh')  # Get mesh element
-        if mesh is None:
-            continue
-        else:
-            # Get vertex list in 3D coordinate format (order matters)
-            Vertices = mesh.findall('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}vertex')
-            vertices = []
-            for vertex in Vertices:
-                x = float(vertex.attrib.get('x'))
-                y = float(vertex.attrib.get('y'))
-                z = float(vertex.attrib.get('z'))
-                vertice = [x, y, z]
-                vertices.append(vertice)
-
-            # Get triangle elements as index sequences, e.g., [0,1,2], [3,1,2]
-            Triangles = mesh.findall('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}triangle')
-            for ind, triangle in enumerate(Triangles):
-                triangle_t = copy.deepcopy(triangle)  # Must use deepcopy to avoid modifying original during editing
-                # Convert triangle to 3D coordinate format, shape 3x3
-                triangle_points = [vertices[int(triangle.attrib.get(index))] for index in ["v1", "v2", "v3"]]
-                seq_max_point = seq_point(triangle_points[0],
-                                          seq_point(triangle_points[1], triangle_points[2]))  # Get the most standardized point
-                if equal_point(triangle_points[0], seq_max_point):  # Already encoded as 1, skip
-                    continue
-                else:  # Not encoded as 1, modify order to make it so
-                    if equal_point(triangle_points[1], seq_max_point):  # triangle[1] is most standardized
-                        triangle.attrib["v1"] = str(triangle_t.attrib["v2"])
-                        triangle.attrib["v2"] = str(triangle_t.attrib["v3"])
-                        triangle.attrib["v3"] = str(triangle_t.attrib["v1"])
-                        continue
-                    else:  # triangle[2] is most standardized
-                        triangle.attrib["v1"] = str(triangle_t.attrib["v3"])
-                        triangle.attrib["v2"] = str(triangle_t.attrib["v1"])
-                        triangle.attrib["v3"] = str(triangle_t.attrib["v2"])
-                        continue
-
-    # Defense complete. Save the modified XML tree to the defense file.
-    tree.write(defense_model, encoding="utf-8", xml_declaration=True)
-
-
-
-def Steganographic_detection_model(filepath):
-    """
-    Detect steganographic attacks in 3D model file
-
-    :param filepath: Path to the file to be checked
-    :return: True if steganographic attack is detected, False otherwise
-    """
-    # Parse original XML file
-    tree = ET.parse(filepath)
-    root = tree.getroot()
-
-    objs = root.findall('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}object')
-
-    # Check triangle tags - if not in (v1,v2,v3) format, potential steganography
-    for obj in objs:
-        mesh = obj.find('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}mesh')
-        if obj.find('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}components') is not None:
-            continue  # Skip objects without triangles
-        triangles = mesh.findall('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}triangle')
-        for ind, triangle in enumerate(triangles):
-            key = triangle.attrib.keys()
-            if list(key) == ["v1", "v2", "v3"]:
-                return True
-    return False
\ No newline at end of file
+import numpy as np
+import file_handle as fd
+
+def equal_point(point1, point2):
+    """
+    Determine whether two points (in 3D coordinate space) are the same.
+    Returns True if they are the same, otherwise returns False.
+    :param point1: The first point, format [x1, y1, z1]
+    :param point2: The second point, format [x2, y2, z2]
+    :return: Comparison result. If the coordinates are exactly the same (including order), return True; otherwise, False.
+    """
+    # If the coordinate lengths differ, return False
+    if len(point1) != len(point2):
+        return False
+    else:
+        length = len(point1)
+        for ind in range(length):  # Traverse both point arrays and compare element-wise
+            if point1[ind] != point2[ind]:
+                return False
+        return True  # Return True if all coordinates match
+
+def seq_point(point1, point2):
+    """
+    Select the more 'standardized' point from point1 and point2.
+    The selection rules are as follows:
+    1. Compare the sum of x + y + z. The one with the larger sum is more standardized.
+        2. If equal, compare the x coordinate. The smaller one is more standardized.
+            3. If equal, compare the y coordinate. The smaller one is more standardized.
+                4. If equal, compare the z coordinate. The smaller one is more standardized.
+    These rules are sequential: only proceed to the next if the current condition doesn't determine the result.
+    Note: In theory, the same coordinates for both points should not happen. Such overlap is considered invalid (not discussed here).
+    :param point1: First point [x1, y1, z1]
+    :param point2: Second point [x2, y2, z2]
+    :return: The point that best matches the rule
+    """
+
+    # Check if the coordinate dimensions match
+    if len(point1) != len(point2):
+        raise EOFError
+
+    # Compute sum of coordinates and return the one with the greater sum
+    sum1, sum2 = sum(point1), sum(point2)
+    if sum1 > sum2:
+        return point1
+    elif sum2 > sum1:
+        return point2
+    else:
+        # If sums are equal, compare x, y, z coordinates in order
+        if point1[0] < point2[0]:
+            return point1
+        elif point1[0] > point2[0]:
+            return point2
+        else:
+            if point1[1] < point2[1]:
+                return point1
+            elif point1[1] > point2[1]:
+                return point2
+            else:
+                if point1[2] < point2[2]:
+                    return point1
+                elif point1[2] > point2[2]:
+                    return point2
+                else:
+                    raise EOFError("The input points have identical coordinates")
+
+def seq_point_select(points1, points2):
+    """
+    Vectorized seq_point over arrays of points.
+    :param points1: float array (M, 3), first point of each pair
+    :param points2: float array (M, 3), second point of each pair
+    :return: Boolean array (M,), True where points1 is the more 'standardized' point
+    :raises EOFError: If a pair has identical coordinates (same rule as seq_point)
+    """
+    sum1 = points1[:, 0] + points1[:, 1] + points1[:, 2]
+    sum2 = points2[:, 0] + points2[:, 1] + points2[:, 2]
+
+    # Larger sum wins; undecided pairs fall through to x, y, z where the smaller coordinate wins
+    select1 = sum1 > sum2
+    undecided = ~select1 & ~(sum2 > sum1)
+    for axis in range(3):
+        smaller = undecided & (points1[:, axis] < points2[:, axis])
+        larger = undecided & (points1[:, axis] > points2[:, axis])
+        select1 |= smaller
+        undecided &= ~(smaller | larger)
+
+    if undecided.any():
+        raise EOFError("The input points have identical coordinates")
+    return select1
+
+def seq_point_index(vertices, triangles):
+    """
+    Index (0, 1 or 2) of the most standardized point of every triangle, as
+    seq_point(triangle[0], seq_point(triangle[1], triangle[2])) would select it.
+    :param vertices: float64 array (N, 3)
+    :param triangles: int array (M, 3) of vertex indices
+    :return: int array (M,)
+    """
+    points = vertices[triangles]
+    first12 = seq_point_select(points[:, 1], points[:, 2])
+    best12 = np.where(first12[:, None], points[:, 1], points[:, 2])
+    first0 = seq_point_select(points[:, 0], best12)
+    return np.where(first0, 0, np.where(first12, 1, 2))
+
+def normalize_triangle_order(mesh, vertices, triangles, best=None):
+    """
+    Rotate the vertex order of the triangle elements of one mesh so that the most standardized
+    point comes first: triangle[1] most standardized -> (v2, v3, v1), triangle[2] -> (v3, v1, v2).
+    :param mesh: XML mesh element, modified in place
+    :param vertices: float64 array (N, 3) of the mesh
+    :param triangles: int array (M, 3) of the mesh
+    :param best: Optional result of seq_point_index, computed when not given
+    :return: The rotated triangle array
+    """
+    if best is None:
+        best = seq_point_index(vertices, triangles)
+    changed = np.flatnonzero(best != 0)
+    if len(changed) == 0:  # Already encoded as 1 everywhere, skip
+        return triangles
+
+    Triangles = list(mesh.iter('{%s}triangle' % fd.NS_CORE))
+    for ind in changed.tolist():
+        attrib = Triangles[ind].attrib
+        v1, v2, v3 = attrib["v1"], attrib["v2"], attrib["v3"]
+        if best[ind] == 1:
+            attrib["v1"], attrib["v2"], attrib["v3"] = v2, v3, v1
+        else:
+            attrib["v1"], attrib["v2"], attrib["v3"] = v3, v1, v2
+
+    rolled = (best[:, None] + np.arange(3)) % 3
+    return np.take_along_axis(triangles, rolled, axis=1)
+
+def has_plain_triangles(obj, mesh):
+    """
+    Detection rule of Steganographic_detection_model for one object: True if the object has a mesh
+    (and no components) with a triangle whose attributes are exactly (v1, v2, v3).
+    """
+    if obj.find('.//{%s}components' % fd.NS_CORE) is not None or mesh is None:
+        return False  # Skip objects without triangles
+    for triangle in mesh.iter('{%s}triangle' % fd.NS_CORE):
+        if list(triangle.attrib.keys()) == ["v1", "v2", "v3"]:
+            return True
+    return False
+
+def decode_arrays(vertices, triangles):
+    # Encoding of one mesh: 1 where triangle[0] is the most standardized point, 0 otherwise
+    return (seq_point_index(vertices, triangles) == 0).astype(int)
+
+def Decode(modelpath, streaming=False, workers=1):
+    """
+    Decode the model file and extract triangle point sets from object elements.
+    According to the rule in seq_point, determine whether triangle[0] is the most standardized point.
+    If triangle[0] is the most standardized, encode as 1; otherwise, encode as 0.
+    Return the final binary array as the decoding result of the model file.
+    modelpath may be a path, the model content as bytes, or a ModelDocument.
+    With streaming=True the file is read one object at a time (constant memory); modelpath must
+    then be a path, a file object or bytes.
+    With workers > 1 (or None: one per CPU) the meshes are decoded in a process pool
+    (file_handle.map_mesh_objects) and the results concatenated in document order.
+    """
+    # Define the result list
+    result = []
+
+    if streaming:
+        for obj in fd.iter_model_objects(modelpath):
+            mesh = obj.find('.//{%s}mesh' % fd.NS_CORE)
+            if mesh is not None:
+                vertices, triangles = fd.get_mesh_arrays(mesh)
+                result.extend((seq_point_index(vertices, triangles) == 0).astype(int).tolist())
+        return result
+
+    # Load model file information (parsed once, mesh elements are indexed by object)
+    doc = fd.as_model_document(modelpath)
+
+    if workers != 1:
+        for codes in fd.map_mesh_objects(doc, decode_arrays, workers).values():
+            result.extend(codes.tolist())
+        return result
+
+    # Iterate over objects for encoding
+    for obj in doc.object_list:
+        # Get the mesh as columnar arrays: vertices (N, 3) and triangle indices (M, 3)
+        arrays = doc.mesh_arrays(obj.get("id"))
+        if arrays is not None:
+            vertices, triangles = arrays
+            # Encode 1 where triangle[0] is the most standardized point
+            result.extend((seq_point_index(vertices, triangles) == 0).astype(int).tolist())
+    return result
+
+def Steg_basic_CDR(modelpath, defense_model, streaming=False, workers=1):
+    """
+    Apply countermeasure for Steg attack: remove and reconstruct content.
+    This modifies all triangle encodings in the model file to 1 to destroy steganographic information.
+    The encoding rule is: triangle[0] is the most standardized point => encode as 1.
+    See the `seq_point` function for the definition of "most standardized".
+    A ModelDocument passed as modelpath is modified in place.
+    With streaming=True each object is rewritten and written out as soon as it has been parsed,
+    so peak memory is bounded by the largest object.
+    With workers > 1 (or None: one per CPU) the ordering of every mesh is computed in a process pool
+    (file_handle.map_mesh_objects); the triangle elements are then rotated in document order.
+    """
+    if streaming:
+        def handle_object(obj):
+            mesh = obj.find('.//{%s}mesh' % fd.NS_CORE)
+            if mesh is not None:
+                normalize_triangle_order(mesh, *fd.get_mesh_arrays(mesh))
+
+        fd.stream_model(modelpath, defense_model, handle_object)
+        return
+
+    # Load model file information (parsed once, mesh elements are indexed by object)
+    doc = fd.as_model_document(modelpath)
+
+    if workers != 1:
+        for obj_id, best in fd.map_mesh_objects(doc, seq_point_index, workers).items():
+            vertices, triangles = doc.mesh_arrays(obj_id)
+            triangles = normalize_triangle_order(doc.meshes[obj_id], vertices, triangles, best)
+            doc.set_mesh_arrays(obj_id, vertices, triangles)
+        doc.write(defense_model)
+        return
+
+    for obj in doc.object_list:  # Iterate over object elements
+        obj_id = obj.get("id")
+        arrays = doc.mesh_arrays(obj_id)  # Get the mesh as columnar arrays
+        if arrays is None:
+            continue
+        else:
+            vertices, triangles = arrays
+            triangles = normalize_triangle_order(doc.meshes[obj_id], vertices, triangles)
+            doc.set_mesh_arrays(obj_id, vertices, triangles)
+
+    # Defense complete. Save the modified XML tree to the defense file.
+    doc.write(defense_model)
+
+
+
+def Steganographic_detection_model(filepath, streaming=False):
+    """
+    Detect steganographic attacks in 3D model file
+
+    :param filepath: Path to the file to be checked, the model content as bytes, or a ModelDocument
+    :param streaming: Read the file one object at a time and stop at the first hit
+    :return: True if steganographic attack is detected, False otherwise
+    """
+    # Check triangle tags - if not in (v1,v2,v3) format, potential steganography
+    if streaming:
+        for obj in fd.iter_model_objects(filepath):
+            if has_plain_triangles(obj, obj.find('.//{%s}mesh' % fd.NS_CORE)):
+                return True
+        return False
+
+    # Parse original XML file once
+    doc = fd.as_model_document(filepath)
+
+    for obj in doc.object_list:
+        if has_plain_triangles(obj, doc.meshes.get(obj.get("id"))):
+            return True
+    return False
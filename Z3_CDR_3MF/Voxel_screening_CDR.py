@@ -0,0 +1,131 @@
+import numpy as np
+import file_handle as fd
+import trimesh
+import time
+
+
+def voxel_frame(points, resolution=64, padding=2):
+    """
+    World-space voxel grid covering a set of points.
+    :param points: float array (N, 3) of the points the grid must cover
+    :param resolution: Number of voxels along the longest axis of the points
+    :param padding: Empty voxels added on every side (room for the dilation and the hole filling)
+    :return: (origin, pitch, shape)
+    """
+    low, high = points.min(axis=0), points.max(axis=0)
+    pitch = max(float((high - low).max()), 1e-12) / resolution
+    origin = low - padding * pitch
+    shape = tuple(int(size) for size in np.floor((high - low) / pitch).astype(np.int64) + 1 + 2 * padding)
+    return origin, pitch, shape
+
+
+def voxel_indices(points, frame):
+    """
+    Flat index of the voxel holding each point.
+    :param points: float array (N, 3)
+    :param frame: (origin, pitch, shape) of voxel_frame
+    :return: int64 array (N,)
+    """
+    origin, pitch, shape = frame
+    cells = np.floor((points - origin) / pitch).astype(np.int64)
+    cells = np.clip(cells, 0, np.array(shape) - 1)
+    return np.ravel_multi_index(cells.T, shape)
+
+
+def vertex_grid(points, frame):
+    """
+    Packed bit grid of the voxels holding the given points.
+    :param points: float array (N, 3) of world-space vertices
+    :param frame: (origin, pitch, shape) of voxel_frame
+    :return: uint8 array of packed bits
+    """
+    grid = np.zeros(int(np.prod(frame[2])), dtype=bool)
+    grid[voxel_indices(points, frame)] = True
+    return np.packbits(grid)
+
+
+def solid_grid(surfaces, frame):
+    """
+    Packed bit grid that over-approximates the solid bounded by closed surfaces: the voxels of the
+    (subdivided) surface vertices, dilated by one voxel so that every voxel crossed by a triangle is
+    covered, then filled with binary_fill_holes.
+    :param surfaces: List of world-space vertex arrays of meshes whose edges are shorter than the pitch
+    :param frame: (origin, pitch, shape) of voxel_frame
+    :return: uint8 array of packed bits
+    """
+    # Imported here: scipy is only needed when voxel screening is enabled
+    from scipy import ndimage
+
+    shell = np.zeros(frame[2], dtype=bool)
+    for vertices in surfaces:
+        shell.flat[voxel_indices(vertices, frame)] = True
+    shell = ndimage.binary_dilation(shell, structure=np.ones((3, 3, 3), dtype=bool))
+    return np.packbits(ndimage.binary_fill_holes(shell).ravel())
+
+
+def screen_pairs(meshes, assemblies, pairs, resolution=64, report=None):
+    """
+    Voxel screening of candidate containment pairs before the exact test.
+    Every build item is voxelized in one world-space grid; a pair (container, contained) is
+    "definitely not contained" when a voxel holding a vertex of the contained item lies outside the
+    solid grid of the container (one vectorized AND-NOT over the packed grids of all the items a
+    container is paired with). The solid grids over-approximate the containers, so a rejected pair
+    can never be contained. Containers with a non-watertight instance are not screened.
+    :param meshes: Dictionary {mesh key: local-space trimesh}
+    :param assemblies: List with one entry per build item: list of (mesh key, 4x4 matrix)
+    :param pairs: List of (container, contained) build item indexes to screen
+    :param resolution: Number of voxels along the longest axis of the screened items
+    :param report: Optional dictionary, filled with 'voxel_resolution', 'voxel_screened',
+                   'voxel_rejected' and 'voxel_time'
+    :return: List of the pairs that remain candidates, in the input order
+    """
+    start = time.perf_counter()
+    if len(pairs) == 0:
+        candidates, rejected = [], 0
+    else:
+        items = sorted({ind for pair in pairs for ind in pair})
+        world = {ind: [fd.apply_transform_array(np.asarray(meshes[key].vertices), matrix)
+                       for key, matrix in assemblies[ind]] for ind in items}
+        frame = voxel_frame(np.concatenate([vertices for ind in items for vertices in world[ind]]), resolution)
+        row = {ind: position for position, ind in enumerate(items)}
+        vertex_grids = np.stack([vertex_grid(np.concatenate(world[ind]), frame) for ind in items])
+
+        # Surfaces are subdivided once per mesh, to edges shorter than the pitch at the largest scale it is placed with
+        containers = sorted({container for container, _ in pairs})
+        scales = {}
+        for ind in containers:
+            for key, matrix in assemblies[ind]:
+                scales[key] = max(scales.get(key, 0.0), float(np.linalg.norm(matrix[:3, :3], ord=2)))
+        subdivided = {}
+        for key, scale in scales.items():
+            mesh = meshes[key]
+            if not mesh.is_watertight or scale == 0:
+                subdivided[key] = None
+                continue
+            try:
+                subdivided[key] = trimesh.remesh.subdivide_to_size(
+                    np.asarray(mesh.vertices), np.asarray(mesh.faces), frame[1] / scale)[0]
+            except ValueError:
+                subdivided[key] = None  # Too many subdivision steps: leave the container unscreened
+
+        keep = np.ones(len(pairs), dtype=bool)
+        by_container = {}
+        for position, (container, contained) in enumerate(pairs):
+            by_container.setdefault(container, []).append(position)
+        for container, positions in by_container.items():
+            parts = assemblies[container]
+            if any(subdivided[key] is None for key, _ in parts):
+                continue
+            solid = solid_grid([fd.apply_transform_array(subdivided[key], matrix) for key, matrix in parts], frame)
+            contained = vertex_grids[[row[pairs[position][1]] for position in positions]]
+            outside = np.any(contained & ~solid, axis=1)
+            keep[np.array(positions)[outside]] = False
+        candidates = [pair for pair, flag in zip(pairs, keep) if flag]
+        rejected = int(np.count_nonzero(~keep))
+
+    if report is not None:
+        report['voxel_resolution'] = resolution
+        report['voxel_screened'] = len(pairs)
+        report['voxel_rejected'] = rejected
+        report['voxel_time'] = time.perf_counter() - start
+    return candidates
@@ -1,49 +1,200 @@
-from pathlib import Path
-import file_handle as fd
-
-
-def exist_Content_Types_file(directory):
-
-    folder = Path(directory)  # Convert to Path object
-
-    if not folder.is_dir():  # Check if the path is a directory
-        raise ValueError(f"{directory} is not a valid directory path")
-
-    if (folder / "[Content_Types].xml").exists():
-        return True
-    else:
-        raise FileNotFoundError("Cannot find [Content_Types].xml, please check your format")
-
-def exist_3dmodel_file(directory):
-    for dir_path in Path(directory).rglob("3D"):
-        # Look for the 3dmodel.model file in the 3D folder
-        model_file = dir_path / "3dmodel.model"
-        if model_file.exists():
-            return True
-        else:
-            raise FileNotFoundError(f"'3dmodel.model' file not found in '{dir_path}'")
-
-    raise FileNotFoundError("No directory containing a '3D' folder found, or no '3dmodel.model' file in it. Please check your format")
-
-def find_3dmodel_file(directory):
-    if exist_3dmodel_file(directory):
-        for dir_path in Path(directory).rglob("3D"):
-            # Look for the 3dmodel.model file in the 3D folder
-            model_file = dir_path / "3dmodel.model"
-            if model_file.exists():
-                return model_file
-
-def exist_rels_file(directory):
-    for dir_path in Path(directory).rglob("_rels"):
-        rel_file = dir_path / ".rels"
-        if rel_file.exists():
-            return True
-        else:
-            raise FileNotFoundError(f"'3dmodel.model' file not found in '{dir_path}'")
-
-    raise FileNotFoundError("No directory containing a '_rels' folder found, or no '.rels' file in it. Please check your format")
-
-def check_3mf_format(filepath, outdir):
-    fd.unzip_3mf(filepath, outdir)
-    if exist_rels_file(outdir) and exist_3dmodel_file(outdir) and exist_rels_file(outdir):
-         return True
+from pathlib import Path, PurePosixPath
+from collections import deque
+import xml.etree.ElementTree as ET
+import zipfile
+import file_handle as fd
+
+RELS_NAMESPACE = "http://schemas.openxmlformats.org/package/2006/relationships"
+CONTENT_TYPES_NAMESPACE = "http://schemas.openxmlformats.org/package/2006/content-types"
+MODEL_RELATIONSHIP_TYPE = "http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"
+MODEL_CONTENT_TYPE = "application/vnd.ms-package.3dmanufacturing-3dmodel+xml"
+
+
+def exist_Content_Types_file(directory):
+
+    folder = Path(directory)  # Convert to Path object
+
+    if not folder.is_dir():  # Check if the path is a directory
+        raise ValueError(f"{directory} is not a valid directory path")
+
+    if (folder / "[Content_Types].xml").exists():
+        return True
+    else:
+        raise FileNotFoundError("Cannot find [Content_Types].xml, please check your format")
+
+def exist_3dmodel_file(directory):
+    for dir_path in Path(directory).rglob("3D"):
+        # Look for the 3dmodel.model file in the 3D folder
+        model_file = dir_path / "3dmodel.model"
+        if model_file.exists():
+            return True
+        else:
+            raise FileNotFoundError(f"'3dmodel.model' file not found in '{dir_path}'")
+
+    raise FileNotFoundError("No directory containing a '3D' folder found, or no '3dmodel.model' file in it. Please check your format")
+
+def find_3dmodel_file(directory):
+    if exist_3dmodel_file(directory):
+        for dir_path in Path(directory).rglob("3D"):
+            # Look for the 3dmodel.model file in the 3D folder
+            model_file = dir_path / "3dmodel.model"
+            if model_file.exists():
+                return model_file
+
+def find_3dmodel_files(directory):
+    """
+    Find every model part of an extracted package, following the relationships from _rels/.rels
+    (see resolve_model_parts); falls back to find_3dmodel_file if the relationships name no part.
+
+    :param directory: Folder the package was extracted to
+    :return: List of model file paths, the start part first
+    """
+    folder = Path(directory)
+    names = {path.relative_to(folder).as_posix() for path in folder.rglob("*") if path.is_file()}
+
+    def read(name):
+        return (folder / name).read_bytes()
+
+    parts = resolve_model_parts(read, names)
+    if len(parts) == 0:
+        return [find_3dmodel_file(directory)]
+    return [folder / name for name in parts]
+
+def exist_rels_file(directory):
+    for dir_path in Path(directory).rglob("_rels"):
+        rel_file = dir_path / ".rels"
+        if rel_file.exists():
+            return True
+        else:
+            raise FileNotFoundError(f"'3dmodel.model' file not found in '{dir_path}'")
+
+    raise FileNotFoundError("No directory containing a '_rels' folder found, or no '.rels' file in it. Please check your format")
+
+def check_3mf_format(filepath, outdir):
+    fd.unzip_3mf(filepath, outdir)
+    if exist_rels_file(outdir) and exist_3dmodel_file(outdir) and exist_rels_file(outdir):
+         return True
+
+def resolve_part_name(target, base="/"):
+    """
+    Resolve a relationship target to a zip member name, e.g. '/3D/3dmodel.model' -> '3D/3dmodel.model'.
+
+    :param target: Target attribute of a relationship
+    :param base: Directory of the part that owns the relationship
+    :return: Member name inside the zip
+    """
+    parts = []
+    for part in PurePosixPath(base, target).parts:
+        if part == "/":
+            continue
+        if part == "..":
+            if parts:
+                parts.pop()
+        elif part != ".":
+            parts.append(part)
+    return "/".join(parts)
+
+def part_relationships_name(member_name):
+    """
+    Member name of the relationships part of a part, e.g. '3D/3dmodel.model' -> '3D/_rels/3dmodel.model.rels'.
+    """
+    path = PurePosixPath(member_name)
+    return (path.parent / "_rels" / (path.name + ".rels")).as_posix()
+
+def parse_model_relationships(content, base="/"):
+    """
+    Model targets of a .rels part.
+
+    :param content: Content of the .rels part as bytes
+    :param base: Directory the relationship targets are relative to
+    :return: List of model member names, in relationship order
+    """
+    root = ET.fromstring(content)
+    return [resolve_part_name(rel.get("Target"), base) for rel in root.findall('{%s}Relationship' % RELS_NAMESPACE)
+            if rel.get("Type") == MODEL_RELATIONSHIP_TYPE and rel.get("Target")]
+
+def resolve_model_parts(read, names):
+    """
+    Resolve every model part of a package from the relationships graph: the start parts of
+    _rels/.rels, then, breadth first, the model parts named by the relationships of each model
+    part (e.g. 3D/_rels/3dmodel.model.rels in production-extension packages).
+
+    :param read: Callable(member name) returning the member content as bytes
+    :param names: Set of the member names of the package
+    :return: List of model member names, the start part first
+    """
+    if "_rels/.rels" not in names:
+        return []
+    parts, seen = [], set()
+    queue = deque(parse_model_relationships(read("_rels/.rels")))
+    while queue:
+        name = queue.popleft()
+        if name in seen or name not in names:
+            continue
+        seen.add(name)
+        parts.append(name)
+        rels_name = part_relationships_name(name)
+        if rels_name in names:
+            base = "/" + PurePosixPath(name).parent.as_posix()
+            queue.extend(parse_model_relationships(read(rels_name), base))
+    return parts
+
+def model_content_type_declared(zip_ref, member_name):
+    """
+    Check in memory that [Content_Types].xml declares the 3D model content type for a member.
+
+    :param zip_ref: Opened zipfile.ZipFile
+    :param member_name: Model member name
+    :return: True if declared by an Override or a Default extension entry, False otherwise
+    """
+    root = ET.fromstring(fd.read_zip_member(zip_ref, "[Content_Types].xml"))
+    for override in root.findall('{%s}Override' % CONTENT_TYPES_NAMESPACE):
+        if resolve_part_name(override.get("PartName", "")) == member_name:
+            return override.get("ContentType") == MODEL_CONTENT_TYPE
+    extension = PurePosixPath(member_name).suffix.lstrip(".").lower()
+    for default in root.findall('{%s}Default' % CONTENT_TYPES_NAMESPACE):
+        if default.get("Extension", "").lower() == extension:
+            return default.get("ContentType") == MODEL_CONTENT_TYPE
+    return False
+
+def find_model_parts(filepath, **budget):
+    """
+    Check the 3mf format directly on the zip, without extracting it, and resolve all its model parts.
+    The structure is validated from the central directory alone; only [Content_Types].xml
+    and the .rels parts are inflated, in memory and under the size budgets of file_handle.
+
+    :param filepath: Path to the 3mf file
+    :param budget: Optional overrides for file_handle.check_zip_budget
+    :return: Member names of the 3D model parts, the start part first
+    :raises ValueError: If the file is not a zip package or exceeds the budgets
+    :raises FileNotFoundError: If a required part is missing
+    """
+    if not fd.is_3mf_file(filepath) or not zipfile.is_zipfile(filepath):
+        raise ValueError(f"{filepath} is not a valid 3MF file")
+
+    with zipfile.ZipFile(filepath, 'r') as zip_ref:
+        fd.check_zip_budget(zip_ref, **budget)
+        names = set(zip_ref.namelist())
+        if "[Content_Types].xml" not in names:
+            raise FileNotFoundError("Cannot find [Content_Types].xml, please check your format")
+        if "_rels/.rels" not in names:
+            raise FileNotFoundError("No '_rels/.rels' file found. Please check your format")
+
+        parts = resolve_model_parts(lambda name: fd.read_zip_member(zip_ref, name), names)
+        if len(parts) == 0:
+            raise FileNotFoundError("No 3D model part referenced by '_rels/.rels' found. Please check your format")
+        for part in parts:
+            if not model_content_type_declared(zip_ref, part):
+                raise FileNotFoundError(f"'{part}' is not declared as a 3D model in [Content_Types].xml")
+        return parts
+
+def model_part_paths(root):
+    """
+    Parts referenced by the production extension (p:path) of the items and components of a model.
+
+    :param root: Root element of a model part
+    :return: Set of member names
+    """
+    attribute = '{%s}path' % fd.NS_PRODUCTION
+    return {resolve_part_name(elem.get(attribute)) for elem in root.iter()
+            if elem.get(attribute) and elem.tag in ('{%s}item' % fd.NS_CORE, '{%s}component' % fd.NS_CORE)}
@@ -1,174 +1,1162 @@
-import zipfile
-import os
-import numpy as np
-import trimesh
-import xml.etree.ElementTree as ET
-from pathlib import Path
-
-def is_3mf_file(file_path):
-    """
-    Check if the file has a .3mf extension.
-
-    :param file_path: File path (str or Path object)
-    :return: True if it's a .3mf file, False otherwise
-    """
-    file = Path(file_path)  # Convert to Path object
-    if not file.is_file():  # Verify path points to a file
-        raise ValueError(f"{file_path} is not a valid file path")
-
-    return file.suffix.lower() == ".3mf"
-
-def unzip_3mf(file_path, output_dir):
-    """
-    Extract a 3MF file without parsing its internal format.
-
-    :param file_path: Path to the 3MF file
-    :param output_dir: Output directory for extracted files
-    :raises FileExistsError: If input is not a valid 3MF file
-    """
-    if not is_3mf_file(file_path):
-        raise FileExistsError("The file is not a valid 3MF file")
-
-    if not zipfile.is_zipfile(file_path):
-        print(f"{file_path} is not a valid 3MF file")
-        return
-
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-
-    try:
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            zip_ref.extractall(output_dir)
-    except Exception as e:
-        print(f"Extraction error: {e}")
-
-def merge_3mf(folder_path, output_path):
-    """
-    Compress a folder into a 3MF file.
-
-    :param folder_path: Directory to compress
-    :param output_path: Output path for the 3MF file
-    """
-    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, folder_path)
-                zipf.write(file_path, arcname)
-
-def get_file_objects(filepath):
-    """
-    Extract objects section from an XML file.
-
-    :param filepath: Path to the XML file
-    :return: List of object elements
-    """
-    tree = ET.parse(filepath)
-    root = tree.getroot()
-    objects = root.findall('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}object')
-    return objects
-
-def apply_transform(point, transform):
-    """
-    Apply a 3D transformation matrix to a point.
-
-    Args:
-        transform (list): 12-element transformation definition [a, b, c, d, e, f, g, h, i, tx, ty, tz]
-        point (list/tuple): 3D point coordinates [x, y, z]
-
-    Returns:
-        list: Transformed point coordinates [x', y', z']
-
-    Raises:
-        ValueError: If input dimensions are invalid
-    """
-    if len(transform) != 12:
-        raise ValueError("Transform must contain 12 elements")
-    if len(point) != 3:
-        raise ValueError("Point must contain 3 elements")
-
-    # Construct 4x4 transformation matrix
-    matrix = np.array([
-        [transform[0], transform[1], transform[2], transform[9]],
-        [transform[3], transform[4], transform[5], transform[10]],
-        [transform[6], transform[7], transform[8], transform[11]],
-        [0, 0, 0, 1]
-    ])
-
-    # Convert point to homogeneous coordinates [x, y, z, 1]
-    point_homogeneous = np.array([point[0], point[1], point[2], 1])
-
-    # Apply transformation
-    transformed_point = np.dot(matrix, point_homogeneous)
-
-    return transformed_point[:3].tolist()
-
-def get_transform_mesh(obj, transform, status=1):
-    """
-    Extract and transform mesh data from an object element.
-
-    Args:
-        obj: XML object element containing mesh data
-        transform: Transformation matrix to apply
-        status: Optional status flag (default: 1)
-
-    Returns:
-        trimesh.Trimesh: Transformed mesh object
-    """
-    mesh = obj.find('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}mesh')
-
-    if mesh is not None:
-        # Process vertices
-        vertices = []
-        for vertex in mesh.findall('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}vertex'):
-            x = float(vertex.attrib.get('x'))
-            y = float(vertex.attrib.get('y'))
-            z = float(vertex.attrib.get('z'))
-            transformed_vert = apply_transform([x, y, z], transform)
-            vertices.append(transformed_vert)
-        vertices = np.array(vertices)
-
-        # Process triangles
-        triangles = []
-        for triangle in mesh.findall('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}triangle'):
-            triangles.append([
-                triangle.attrib.get('v1'),
-                triangle.attrib.get('v2'),
-                triangle.attrib.get('v3')
-            ])
-        triangles = np.array(triangles)
-
-        return trimesh.Trimesh(vertices=vertices, faces=triangles)
-
-def get_file_items(filepath):
-    """
-    Extract items section from an XML file.
-
-    :param filepath: Path to the XML file
-    :return: List of item elements
-    """
-    tree = ET.parse(filepath)
-    root = tree.getroot()
-    items = root.findall('.//{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}item')
-    return items
-
-def indent(elem, level=0):
-    """
-    Recursively add line breaks and indentation to XML elements.
-
-    :param elem: ET.Element to process
-    :param level: Current indentation level
-    """
-    i = "\n" + "  " * level
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = i + "  "
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
-        for child in elem:
-            indent(child, level + 1)
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
-    else:
-        if level and (not elem.tail or not elem.tail.strip()):
-            elem.tail = i
\ No newline at end of file
+import zipfile
+import os
+import io
+import re
+import mmap
+import hashlib
+import struct
+import zlib
+import shutil
+import numpy as np
+import trimesh
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import chain
+from operator import attrgetter, itemgetter
+
+def is_3mf_file(file_path):
+    """
+    Check if the file has a .3mf extension.
+
+    :param file_path: File path (str or Path object)
+    :return: True if it's a .3mf file, False otherwise
+    """
+    file = Path(file_path)  # Convert to Path object
+    if not file.is_file():  # Verify path points to a file
+        raise ValueError(f"{file_path} is not a valid file path")
+
+    return file.suffix.lower() == ".3mf"
+
+def unzip_3mf(file_path, output_dir):
+    """
+    Extract a 3MF file without parsing its internal format.
+
+    :param file_path: Path to the 3MF file
+    :param output_dir: Output directory for extracted files
+    :raises FileExistsError: If input is not a valid 3MF file
+    """
+    if not is_3mf_file(file_path):
+        raise FileExistsError("The file is not a valid 3MF file")
+
+    if not zipfile.is_zipfile(file_path):
+        print(f"{file_path} is not a valid 3MF file")
+        return
+
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    try:
+        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            zip_ref.extractall(output_dir)
+    except Exception as e:
+        print(f"Extraction error: {e}")
+
+# Budgets applied to a 3MF package before any member is inflated
+MAX_PACKAGE_SIZE = 1 << 30  # Total uncompressed size of all members (1 GiB)
+MAX_MEMBER_SIZE = 512 << 20  # Uncompressed size of a single member (512 MiB)
+MAX_COMPRESSION_RATIO = 200  # Uncompressed / compressed size of a single member
+MAX_MEMBER_COUNT = 10000  # Number of entries in the central directory
+
+
+def check_zip_budget(zip_ref, max_total_size=MAX_PACKAGE_SIZE, max_member_size=MAX_MEMBER_SIZE,
+                     max_ratio=MAX_COMPRESSION_RATIO, max_members=MAX_MEMBER_COUNT):
+    """
+    Check the central directory of an opened 3MF package against the size budgets.
+    Nothing is inflated: only the sizes declared in the central directory are used.
+
+    :param zip_ref: Opened zipfile.ZipFile
+    :param max_total_size: Maximum total uncompressed size of the package
+    :param max_member_size: Maximum uncompressed size of a single member
+    :param max_ratio: Maximum compression ratio of a single member
+    :param max_members: Maximum number of members
+    :raises ValueError: If any budget is exceeded
+    """
+    infos = zip_ref.infolist()
+    if len(infos) > max_members:
+        raise ValueError(f"Package has {len(infos)} members, budget is {max_members}")
+
+    total = 0
+    for info in infos:
+        if info.file_size > max_member_size:
+            raise ValueError(f"Member {info.filename} is {info.file_size} bytes, budget is {max_member_size}")
+        if info.file_size > max(info.compress_size, 1) * max_ratio:
+            raise ValueError(f"Member {info.filename} exceeds the compression ratio budget of {max_ratio}")
+        total += info.file_size
+        if total > max_total_size:
+            raise ValueError(f"Package exceeds the total size budget of {max_total_size} bytes")
+
+
+def read_zip_member(zip_ref, name, max_size=MAX_MEMBER_SIZE, chunk_size=1 << 20):
+    """
+    Read one member of a 3MF package into memory.
+    The size is enforced while inflating, so a member whose central directory entry lies
+    about its size is aborted as soon as the budget is crossed.
+
+    :param zip_ref: Opened zipfile.ZipFile
+    :param name: Member name
+    :param max_size: Maximum number of uncompressed bytes to accept
+    :param chunk_size: Number of bytes inflated per read
+    :return: Member content as bytes
+    :raises ValueError: If the member inflates beyond max_size
+    """
+    buffer = io.BytesIO()
+    with zip_ref.open(name, 'r') as member:
+        while True:
+            chunk = member.read(chunk_size)
+            if not chunk:
+                break
+            if buffer.tell() + len(chunk) > max_size:
+                raise ValueError(f"Member {name} inflates beyond {max_size} bytes")
+            buffer.write(chunk)
+    return buffer.getvalue()
+
+
+# Zip record layouts (APPNOTE.TXT 4.3.7, 4.3.12 and 4.3.16)
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_OF_CENTRAL_DIR = struct.Struct("<IHHHHIIH")
+_ZIP32_LIMIT = 0xFFFFFFFF
+
+
+def _dos_datetime(date_time):
+    """
+    Convert a ZipInfo.date_time tuple to the (time, date) pair stored in zip headers.
+    """
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+def _encode_member_name(name):
+    """
+    Encode a member name, returning (bytes, flag bits). Non-ASCII names set the UTF-8 flag.
+    """
+    try:
+        return name.encode("ascii"), 0
+    except UnicodeEncodeError:
+        return name.encode("utf-8"), 0x800
+
+
+def _deflate_member(data, level):
+    """
+    Raw-deflate one member. zlib releases the GIL, so this runs in parallel in a thread pool.
+
+    :return: (compressed bytes, crc32, uncompressed size)
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), zlib.crc32(data), len(data)
+
+
+def _copy_raw_member(src, info, dst):
+    """
+    Copy the compressed bytes of a member from the input zip to dst, without inflating them.
+    """
+    src.seek(info.header_offset)
+    header = src.read(_LOCAL_HEADER.size)
+    if len(header) != _LOCAL_HEADER.size or _LOCAL_HEADER.unpack(header)[0] != 0x04034b50:
+        raise ValueError(f"Bad local file header for member {info.filename}")
+    name_length, extra_length = _LOCAL_HEADER.unpack(header)[9:11]
+    src.seek(info.header_offset + _LOCAL_HEADER.size + name_length + extra_length)
+
+    remaining = info.compress_size
+    while remaining > 0:
+        chunk = src.read(min(remaining, 1 << 20))
+        if not chunk:
+            raise ValueError(f"Member {info.filename} is truncated")
+        dst.write(chunk)
+        remaining -= len(chunk)
+
+
+def repack_3mf(input_path, output_path, replaced, max_workers=None, level=6):
+    """
+    Write a copy of a 3MF package with some members replaced.
+    Unchanged members are copied as raw compressed bytes straight from the input zip; replaced
+    members are deflated in a thread pool. Members keep the input order, and new members are
+    appended sorted by name, so the output is deterministic.
+
+    :param input_path: Path to the original 3MF file
+    :param output_path: Output path for the new 3MF file
+    :param replaced: Dictionary {member name: new content as bytes}
+    :param max_workers: Number of compression threads (default: ThreadPoolExecutor default)
+    :param level: zlib compression level for replaced members
+    :raises ValueError: If the package would need Zip64 records
+    """
+    with zipfile.ZipFile(input_path, 'r') as zin:
+        infos = zin.infolist()
+    known = {info.filename for info in infos}
+    new_names = sorted(name for name in replaced if name not in known)
+    order = [info.filename for info in infos if info.filename in replaced] + new_names
+
+    # Compress all replaced members concurrently; map() keeps the results in input order
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        compressed = dict(zip(order, pool.map(lambda name: _deflate_member(replaced[name], level), order)))
+
+    entries = [(info.filename, info) for info in infos] + [(name, None) for name in new_names]
+    if len(entries) >= 0xFFFF:
+        raise ValueError("Too many members for a zip without Zip64 records")
+
+    central = []
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        for name, info in entries:
+            name_bytes, name_flag = _encode_member_name(name)
+            offset = dst.tell()
+            if name in compressed:
+                data, crc, file_size = compressed[name]
+                method, compress_size = zipfile.ZIP_DEFLATED, len(data)
+                flags = name_flag
+            else:
+                data, crc, file_size = None, info.CRC, info.file_size
+                method, compress_size = info.compress_type, info.compress_size
+                # Sizes are known up front, so the data descriptor bit is dropped
+                flags = (info.flag_bits & ~0x808) | name_flag
+            if max(offset, compress_size, file_size) > _ZIP32_LIMIT:
+                raise ValueError("Package is too large for a zip without Zip64 records")
+
+            date_time = info.date_time if info is not None else (1980, 1, 1, 0, 0, 0)
+            dos_time, dos_date = _dos_datetime(date_time)
+            version = 20 if method == zipfile.ZIP_DEFLATED else 10
+            dst.write(_LOCAL_HEADER.pack(0x04034b50, version, flags, method, dos_time, dos_date,
+                                         crc, compress_size, file_size, len(name_bytes), 0))
+            dst.write(name_bytes)
+            if data is None:
+                _copy_raw_member(src, info, dst)
+            else:
+                dst.write(data)
+
+            external_attr = info.external_attr if info is not None else 0o600 << 16
+            create_system = info.create_system if info is not None else 0
+            central.append(_CENTRAL_HEADER.pack(0x02014b50, (create_system << 8) | version, version, flags,
+                                                method, dos_time, dos_date, crc, compress_size, file_size,
+                                                len(name_bytes), 0, 0, 0, 0, external_attr, offset) + name_bytes)
+
+        central_offset = dst.tell()
+        for record in central:
+            dst.write(record)
+        central_size = dst.tell() - central_offset
+        if central_offset + central_size > _ZIP32_LIMIT:
+            raise ValueError("Package is too large for a zip without Zip64 records")
+        dst.write(_END_OF_CENTRAL_DIR.pack(0x06054b50, 0, 0, len(central), len(central),
+                                           central_size, central_offset, 0))
+
+
+def merge_3mf(folder_path, output_path):
+    """
+    Compress a folder into a 3MF file.
+
+    :param folder_path: Directory to compress
+    :param output_path: Output path for the 3MF file
+    """
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for root, dirs, files in os.walk(folder_path):
+            for file in files:
+                file_path = os.path.join(root, file)
+                arcname = os.path.relpath(file_path, folder_path)
+                zipf.write(file_path, arcname)
+
+NS_CORE = "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"
+NS_PRODUCTION = "http://schemas.microsoft.com/3dmanufacturing/production/2015/06"
+IDENTITY_TRANSFORM = "1 0 0 0 1 0 0 0 1 0 0 0"
+MAX_BUILD_INSTANCES = 100000  # Mesh instances produced by flattening the components of all build items
+
+
+def parse_model_namespaces(source):
+    """
+    Parse a 3D model part and collect its namespace declarations (start-ns events), so that it can
+    be written back with the document's own prefixes.
+
+    :param source: Path to the model file, file object, or the model content as bytes
+    :return: (ET.ElementTree, {namespace uri: prefix}, [(prefix, uri)] declarations to emit on the root)
+    """
+    prefixes = {XML_NAMESPACE: "xml"}
+    used = {"xml"}
+    declarations = []
+    parser = ET.iterparse(_open_model_source(source), events=("start-ns",))
+    for _, (prefix, uri) in parser:
+        if uri in prefixes:
+            continue
+        if prefix in used:
+            # The same prefix bound to another namespace further down: give this one a fresh prefix
+            prefix = next("ns%d" % number for number in range(len(used) + 1) if "ns%d" % number not in used)
+        prefixes[uri] = prefix
+        used.add(prefix)
+        declarations.append((prefix, uri))
+    return ET.ElementTree(parser.root), prefixes, declarations
+
+def parse_transform(transform):
+    """
+    Convert a transform attribute into a tuple of 12 floats.
+
+    :param transform: Transform string, e.g. "1 0 0 0 1 0 0 0 1 0 0 0"
+    :return: Tuple of 12 floats
+    :raises ValueError: If the transform does not contain 12 values
+    """
+    values = tuple(map(float, transform.strip().split()))
+    if len(values) != 12:
+        raise ValueError("Transform must contain 12 elements")
+    return values
+
+
+def reference_id(elem):
+    """
+    Object id referenced by an item or component element. An object of another model part
+    (production extension p:path) is qualified as 'path#id', so that it never matches a local object.
+
+    :param elem: item or component element
+    :return: Object id string ('empty' if the element has no objectid)
+    """
+    obj_id = elem.get("objectid", "empty")
+    path = elem.get('{%s}path' % NS_PRODUCTION)
+    return "%s#%s" % (path, obj_id) if path else obj_id
+
+def _file_stat(path):
+    # (size, modification time) of a file, None if it cannot be read
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+class ModelDocument:
+    """
+    A 3D model part parsed once, with the indexes shared by every detector.
+
+    Attributes:
+        tree, root: Parsed ElementTree and its root element
+        object_list: Object elements in document order
+        objects: Dictionary {object id: object element}
+        items: Build item elements in build order
+        builds: List of [objectid, transform string, index] per build item (see reference_id)
+        transforms: Tuple of 12 floats per build item
+        components: Dictionary {object id: [(component objectid, transform tuple)]}
+        meshes: Dictionary {object id: mesh element} for objects that have a mesh
+        prefixes, declarations: Namespace prefixes of the source document (see parse_model_namespaces)
+        source: Path or bytes the document was parsed from (None for a file object), see object_ranges
+
+    Component hierarchies are flattened on demand (object_instances) and memoized per object,
+    so a sub-assembly referenced many times is resolved once.
+    Defenses edit the tree in place and call reindex() afterwards.
+    """
+
+    def __init__(self, source):
+        self.tree, self.prefixes, self.declarations = parse_model_namespaces(source)
+        self.root = self.tree.getroot()
+        self.source = source if isinstance(source, (str, os.PathLike, bytes, bytearray)) else None
+        self._source_stat = _file_stat(source) if isinstance(source, (str, os.PathLike)) else None
+        self.reindex()
+        # Objects and mesh elements as parsed, to tell which byte ranges of the source still apply
+        self._parsed_ids = [obj.get("id") for obj in self.object_list]
+        self._parsed_meshes = dict(self.meshes)
+        self._object_ranges = None
+
+    def reindex(self):
+        """
+        Rebuild the indexes from the current state of the tree.
+        The cached arrays and fingerprints of the mesh elements still in the tree are kept (defenses
+        that rewrite a mesh update them with set_mesh_arrays); the flattened component instances are rebuilt.
+        """
+        previous = getattr(self, 'meshes', {})
+        self.object_list = self.root.findall('.//{%s}object' % NS_CORE)
+        self.objects = {obj.attrib.get('id', 'empty'): obj for obj in self.object_list}
+        self.items = self.root.findall('.//{%s}item' % NS_CORE)
+        self.builds = [[reference_id(item), item.get("transform", IDENTITY_TRANSFORM), index]
+                       for index, item in enumerate(self.items)]
+        self.transforms = [parse_transform(build[1]) for build in self.builds]
+
+        self.components = {}
+        self.meshes = {}
+        for obj in self.object_list:
+            obj_id = obj.get("id")
+            self.components[obj_id] = []
+            com = obj.find('.//{%s}components' % NS_CORE)
+            if com is not None:
+                for child in com:
+                    self.components[obj_id].append((reference_id(child),
+                                                    parse_transform(child.get("transform", IDENTITY_TRANSFORM))))
+            mesh = obj.find('.//{%s}mesh' % NS_CORE)
+            if mesh is not None:
+                self.meshes[obj_id] = mesh
+        kept = {obj_id for obj_id, mesh in self.meshes.items() if previous.get(obj_id) is mesh}
+        self._mesh_arrays = {obj_id: arrays for obj_id, arrays in getattr(self, '_mesh_arrays', {}).items()
+                             if obj_id in kept}
+        self._fingerprints = {key: value for key, value in getattr(self, '_fingerprints', {}).items()
+                              if key[0] in kept}
+        self._instance_counts = {}
+        self._instances = {}
+
+    def _postorder(self, obj_id, done):
+        """
+        Objects of the component hierarchy below obj_id that are not in done, children first.
+
+        :raises ValueError: If the hierarchy contains a circular reference
+        """
+        order = []
+        finished = set()
+        visiting = set()
+        stack = [(obj_id, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in done or node in finished:
+                continue
+            if expanded:
+                visiting.discard(node)
+                finished.add(node)
+                order.append(node)
+                continue
+            if node in visiting:
+                raise ValueError("Circular component reference: %s" % node)
+            visiting.add(node)
+            stack.append((node, True))
+            for child, _ in self.components.get(node, ()):
+                if child in self.objects and child not in done and child not in finished:
+                    stack.append((child, False))
+        return order
+
+    def instance_count(self, obj_id, removed=None, counts=None):
+        """
+        Number of mesh instances of an object once its components are flattened, without building them.
+        Counts are memoized per sub-assembly.
+
+        :param obj_id: Object id
+        :param removed: Optional dictionary {object id: set of component indexes} not counted
+                        (e.g. the repeated components about to be removed)
+        :param counts: Memo dictionary to use with removed, shared by the calls with the same removed
+        :return: int (0 for an unknown id)
+        :raises ValueError: If the hierarchy contains a circular reference
+        """
+        if obj_id not in self.objects:
+            return 0
+        if removed is None:
+            removed, counts = {}, self._instance_counts
+        elif counts is None:
+            counts = {}
+        for node in self._postorder(obj_id, counts):
+            skip = removed.get(node, ())
+            counts[node] = int(node in self.meshes) + sum(
+                counts[child] for index, (child, _) in enumerate(self.components[node])
+                if child in self.objects and index not in skip)
+        return counts[obj_id]
+
+    def object_instances(self, obj_id, max_instances=MAX_BUILD_INSTANCES):
+        """
+        Flatten the components of an object into mesh instances, memoized per sub-assembly.
+
+        :param obj_id: Object id
+        :param max_instances: Largest accepted number of instances for this object
+        :return: (list of mesh object ids, float64 array (k, 4, 4) of transforms in the object's frame)
+        :raises ValueError: On a circular reference, or if the object expands to more than max_instances
+        """
+        if obj_id not in self.objects:
+            return [], np.zeros((0, 4, 4))
+        count = self.instance_count(obj_id)
+        if count > max_instances:
+            raise ValueError("Object %s expands to %d mesh instances (limit %d)" % (obj_id, count, max_instances))
+
+        instances = self._instances
+        for node in self._postorder(obj_id, instances):
+            ids, matrices = [], []
+            if node in self.meshes:
+                ids.append(node)
+                matrices.append(np.eye(4)[None])
+            for child, transform in self.components[node]:
+                if child in self.objects:
+                    child_ids, child_matrices = instances[child]
+                    ids.extend(child_ids)
+                    matrices.append(transform_matrix(transform) @ child_matrices)
+            instances[node] = (ids, np.concatenate(matrices) if matrices else np.zeros((0, 4, 4)))
+        return instances[obj_id]
+
+    def mesh_arrays(self, obj_id):
+        """
+        Columnar arrays of an object's mesh, extracted on first use and cached.
+
+        :param obj_id: Object id
+        :return: (vertices float64 (N, 3), triangles int32 (M, 3)), or None if the object has no mesh
+        :raises KeyError: If there is no object with this id
+        """
+        if obj_id not in self.objects:
+            raise KeyError(obj_id)
+        if obj_id not in self._mesh_arrays:
+            mesh = self.meshes.get(obj_id)
+            self._mesh_arrays[obj_id] = None if mesh is None else get_mesh_arrays(mesh)
+        return self._mesh_arrays[obj_id]
+
+    def object_ranges(self):
+        """
+        Byte ranges of the mesh objects in the source, so that their XML can be converted to arrays
+        elsewhere (see map_mesh_objects). The source is scanned once for the <object> tags; the scan
+        is only trusted if it finds exactly the objects of the parse, in the same order.
+
+        :return: Dictionary {object id: (start, end)} of the objects whose mesh element is still the
+                 parsed one; empty if the document has no path or bytes source, is not UTF-8, the
+                 scan does not match the parse, or the file has changed since it was parsed
+        """
+        if self._source_stat is not None and _file_stat(self.source) != self._source_stat:
+            return {}
+        if self._object_ranges is None:
+            self._object_ranges = {}
+            if self.source is not None:
+                if isinstance(self.source, (bytes, bytearray)):
+                    self._object_ranges = self._scan_objects(self.source)
+                else:
+                    with open(self.source, 'rb') as file:
+                        if os.fstat(file.fileno()).st_size:
+                            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                                self._object_ranges = self._scan_objects(data)
+        return {obj_id: span for obj_id, span in self._object_ranges.items()
+                if obj_id in self.meshes and self.meshes[obj_id] is self._parsed_meshes.get(obj_id)}
+
+    def _scan_objects(self, data):
+        # {object id: (start, end)} of the mesh objects of the parse, from a scan of the raw bytes
+        if re.match(rb'(?:\xef\xbb\xbf)?<\?xml[^>]*encoding\s*=\s*["\'](?!utf-8["\'])', data, re.I):
+            return {}
+        names = self.core_tag_prefixes()
+        start_tag = re.compile(rb'<(?:%s)object(?=[\s/>])' % names)
+        end_tag = re.compile(rb'</(?:%s)object\s*>' % names)
+        id_attribute = re.compile(rb'\sid\s*=\s*(["\'])(.*?)\1', re.S)
+
+        ids, spans, position = [], [], 0
+        while len(ids) <= len(self._parsed_ids):
+            match = start_tag.search(data, position)
+            if match is None:
+                break
+            tag_end = data.find(b">", match.end()) + 1
+            attribute = id_attribute.search(data, match.end(), tag_end)
+            ids.append(attribute.group(2).decode("utf-8", "replace") if attribute else None)
+            if data[tag_end - 2:tag_end] == b"/>":
+                position = tag_end
+                continue
+            end = end_tag.search(data, tag_end)
+            if end is None:
+                return {}
+            spans.append((ids[-1], match.start(), end.end()))
+            position = end.end()
+        if ids != self._parsed_ids:
+            return {}
+        return {obj_id: (start, end) for obj_id, start, end in spans
+                if obj_id is not None and obj_id in self._parsed_meshes}
+
+    def core_tag_prefixes(self):
+        """
+        Regular expression alternation (bytes) of the tag prefixes of the core namespace, e.g. b"|m:".
+        """
+        return b"|".join(re.escape(prefix.encode() + b":") if prefix else b""
+                         for prefix, uri in self.declarations if uri == NS_CORE)
+
+    def fragment_wrapper(self):
+        """
+        Opening and closing tags that declare the namespaces of the document around an object fragment,
+        and the core tag prefixes (see core_tag_prefixes).
+
+        :return: (opening bytes, closing bytes, core tag prefixes)
+        """
+        declarations = "".join(' xmlns%s="%s"' % (":" + prefix if prefix else "", escape(uri, {'"': "&quot;"}))
+                               for prefix, uri in self.declarations)
+        return ("<fragment%s>" % declarations).encode(), b"</fragment>", self.core_tag_prefixes()
+
+    def set_mesh_arrays(self, obj_id, vertices, triangles):
+        """
+        Replace the cached arrays of an object after a defense has rewritten its mesh element.
+        """
+        self._mesh_arrays[obj_id] = (vertices, triangles)
+        self._fingerprints = {key: value for key, value in self._fingerprints.items() if key[0] != obj_id}
+
+    def keep_triangles(self, obj_id, keep):
+        """
+        Keep only some triangles of an object: the <triangle> elements are rewritten in one slice
+        assignment and the cached arrays follow.
+
+        :param obj_id: Object id of a mesh object
+        :param keep: bool array with one entry per triangle
+        """
+        vertices, triangles = self.mesh_arrays(obj_id)
+        triangles_elem = self.meshes[obj_id].find('{%s}triangles' % NS_CORE)
+        children = np.empty(len(triangles_elem), dtype=object)
+        children[:] = list(triangles_elem)
+        triangles_elem[:] = children[keep].tolist()
+        self.set_mesh_arrays(obj_id, vertices, triangles[keep])
+
+    def object_fingerprint(self, obj_id, tolerance=1e-6):
+        """
+        Fingerprint of an object's untransformed mesh, computed once per (object, tolerance).
+
+        :param obj_id: Object id
+        :param tolerance: Quantization step of the coordinates
+        :return: Hex digest (see mesh_fingerprint), or None if the object has no mesh
+        """
+        key = (obj_id, tolerance)
+        if key not in self._fingerprints:
+            arrays = self.mesh_arrays(obj_id)
+            self._fingerprints[key] = None if arrays is None else mesh_fingerprint(arrays[0], arrays[1], tolerance)
+        return self._fingerprints[key]
+
+    def get_transform_mesh(self, obj_id, transform):
+        """
+        Build the trimesh of an object placed with a transform, from the cached arrays.
+
+        :param obj_id: Object id
+        :param transform: 12-element transform or 4x4 matrix
+        :return: trimesh.Trimesh, or None if the object has no mesh
+        """
+        arrays = self.mesh_arrays(obj_id)
+        if arrays is not None:
+            return trimesh.Trimesh(vertices=apply_transform_array(arrays[0], transform), faces=arrays[1])
+
+    def write(self, output):
+        """
+        Write the (possibly defended) model with indentation (see write_model).
+
+        :param output: Output path or binary file object
+        """
+        write_model(self, output)
+
+
+def resolve_build_instances(source, max_instances=MAX_BUILD_INSTANCES, skip=None, decimals=None):
+    """
+    Flatten every build item into the mesh instances it places.
+
+    :param source: ModelDocument, path to the model file, or the model content as bytes
+    :param max_instances: Largest accepted total number of instances; checked on the instance counts
+                          before any transform is composed
+    :param skip: Optional build item indexes left out (their entry is an empty list)
+    :param decimals: Optional number of decimals the build transforms are rounded to before composing
+    :return: List with one entry per build item: list of (mesh object id, 4x4 world matrix)
+    :raises ValueError: On a circular component reference, or if the build expands to more than max_instances
+    """
+    doc = as_model_document(source)
+    skip = set() if skip is None else set(skip)
+    total = sum(doc.instance_count(build[0]) for index, build in enumerate(doc.builds) if index not in skip)
+    if total > max_instances:
+        raise ValueError("Build expands to %d mesh instances (limit %d)" % (total, max_instances))
+
+    resolved = []
+    for index, (build, transform) in enumerate(zip(doc.builds, doc.transforms)):
+        if index in skip:
+            resolved.append([])
+            continue
+        if decimals is not None:
+            transform = [round(x, decimals) for x in transform]
+        ids, matrices = doc.object_instances(build[0], max_instances)
+        resolved.append(list(zip(ids, transform_matrix(transform) @ matrices)))
+    return resolved
+
+
+def _plain_fragment_arrays(fragment, names):
+    # Arrays of an object fragment read straight from its bytes, for the plain layout only: one mesh,
+    # <vertex x y z/> and <triangle v1 v2 v3/> rows in the core namespace, no namespace declaration,
+    # comment, processing instruction or entity. Anything else gives None and goes through ElementTree.
+    if fragment.count(b"mesh") != 2 or b"xmlns" in fragment:
+        return None
+    start, end = fragment.find(b"mesh"), fragment.rfind(b"mesh")
+    region = fragment[start:end]
+    if b"<!" in region or b"<?" in region or b"&" in region:
+        return None
+    vertex = re.compile(rb'<(?:%s)vertex\s+x="([^"]*)"\s+y="([^"]*)"\s+z="([^"]*)"\s*/>' % names)
+    triangle = re.compile(rb'<(?:%s)triangle\s+v1="([^"]*)"\s+v2="([^"]*)"\s+v3="([^"]*)"\s*/>' % names)
+    vertex_rows, triangle_rows = vertex.findall(region), triangle.findall(region)
+    # Every vertex and triangle tag of the region must be one of the rows
+    if region.count(b"vertex") != len(vertex_rows) or \
+            region.count(b"triangle") - region.count(b"triangles") != len(triangle_rows):
+        return None
+    try:
+        vertices = np.fromiter(map(float, chain.from_iterable(vertex_rows)), dtype=np.float64,
+                               count=3 * len(vertex_rows)).reshape(-1, 3)
+        triangles = np.fromiter(map(int, chain.from_iterable(triangle_rows)), dtype=np.int32,
+                                count=3 * len(triangle_rows)).reshape(-1, 3)
+    except (ValueError, OverflowError):
+        return None
+    return vertices, triangles
+
+def _fragment_arrays(fragment, wrapper, obj_id):
+    # Arrays of the mesh of an object fragment, None if the fragment does not parse back to that object
+    head = fragment[:fragment.find(b">") + 1]
+    if re.search(rb'\sid\s*=\s*(["\'])%s\1' % re.escape(obj_id.encode()), head) is None:
+        return None
+    plain = _plain_fragment_arrays(fragment, wrapper[2])
+    if plain is not None:
+        return plain
+    try:
+        obj = ET.fromstring(wrapper[0] + fragment + wrapper[1])[0]
+    except ET.ParseError:
+        return None
+    mesh = obj.find('.//{%s}mesh' % NS_CORE)
+    if obj.tag != '{%s}object' % NS_CORE or obj.get("id") != obj_id or mesh is None:
+        return None
+    return get_mesh_arrays(mesh)
+
+def _map_mesh_chunk(task):
+    # Process pool task: apply func to the meshes of a chunk of objects. A mesh comes either as its
+    # arrays or as the byte range of its object (bytes, or (start, end) in the source file), which is
+    # converted here; objects whose range does not convert are sent back for the parent to handle
+    func, path, wrapper, chunk = task
+    done, missed = [], []
+    with (open(path, 'rb') if path is not None else io.BytesIO()) as file:
+        for index, obj_id, arrays, fragment in chunk:
+            converted = None
+            if arrays is None:
+                if not isinstance(fragment, bytes):
+                    file.seek(fragment[0])
+                    fragment = file.read(fragment[1] - fragment[0])
+                arrays = converted = _fragment_arrays(fragment, wrapper, obj_id)
+                if arrays is None:
+                    missed.append(index)
+                    continue
+            done.append((index, converted, func(*arrays)))
+    return done, missed
+
+def map_mesh_objects(source, func, workers=None, chunks_per_worker=4):
+    """
+    Apply a per-mesh function to every object with a mesh, in a pool of worker processes.
+    The XML to array conversion runs in the workers: a mesh not converted yet is sent as the byte
+    range of its object in the source (ModelDocument.object_ranges), read and parsed by the worker,
+    and its arrays come back to fill the document's cache; already converted meshes are sent as
+    arrays. Objects are spread over chunks balanced on their triangle count, and the results are
+    reassembled in document order. Meshes without a usable byte range are converted in this process.
+
+    :param source: ModelDocument, path to the model file, or the model content as bytes
+    :param func: Picklable (module-level) callable(vertices, triangles)
+    :param workers: Number of worker processes (None: one per CPU, 1: run in this process)
+    :param chunks_per_worker: Number of chunks per worker, for load balancing
+    :return: Dictionary {object id: result of func}, in document order
+    """
+    doc = as_model_document(source)
+    ids = [obj.get("id") for obj in doc.object_list if obj.get("id") in doc.meshes]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(ids) < 2:
+        return {obj_id: func(*doc.mesh_arrays(obj_id)) for obj_id in ids}
+
+    ranges = doc.object_ranges()
+    path = None if isinstance(doc.source, (bytes, bytearray)) else doc.source
+    tasks, weights = [], []
+    for index, obj_id in enumerate(ids):
+        if obj_id in doc._mesh_arrays or obj_id not in ranges:
+            arrays = doc.mesh_arrays(obj_id)
+            tasks.append((index, obj_id, arrays, None))
+            weights.append(len(arrays[1]))
+        else:
+            start, end = ranges[obj_id]
+            tasks.append((index, obj_id, None, (start, end) if path is not None else bytes(doc.source[start:end])))
+            triangles_elem = doc.meshes[obj_id].find('{%s}triangles' % NS_CORE)
+            weights.append(0 if triangles_elem is None else len(triangles_elem))
+
+    # Largest objects first, each one to the chunk with the fewest triangles so far
+    chunk_count = min(len(ids), workers * chunks_per_worker)
+    chunks = [[] for _ in range(chunk_count)]
+    loads = [0] * chunk_count
+    for index in sorted(range(len(ids)), key=weights.__getitem__, reverse=True):
+        target = loads.index(min(loads))
+        chunks[target].append(tasks[index])
+        loads[target] += weights[index] + 1
+
+    results = [None] * len(ids)
+    missed = []
+    wrapper = doc.fragment_wrapper()
+    with ProcessPoolExecutor(max_workers=min(workers, chunk_count)) as pool:
+        for done, chunk_missed in pool.map(_map_mesh_chunk, [(func, path, wrapper, chunk) for chunk in chunks if chunk]):
+            for index, arrays, result in done:
+                if arrays is not None:
+                    doc._mesh_arrays.setdefault(ids[index], arrays)
+                results[index] = result
+            missed.extend(chunk_missed)
+    for index in missed:
+        results[index] = func(*doc.mesh_arrays(ids[index]))
+    return dict(zip(ids, results))
+
+def as_model_document(source):
+    """
+    Return source unchanged if it is already a ModelDocument, otherwise parse it once.
+
+    :param source: ModelDocument, path to the model file, or the model content as bytes
+    :return: ModelDocument
+    """
+    if isinstance(source, ModelDocument):
+        return source
+    return ModelDocument(source)
+
+def get_file_objects(filepath):
+    """
+    Extract objects section from an XML file.
+
+    :param filepath: Path to the XML file, the model content as bytes, or a ModelDocument
+    :return: List of object elements
+    """
+    return as_model_document(filepath).object_list
+
+def transform_matrix(transform):
+    """
+    Build the 4x4 transformation matrix of a 12-element transform.
+
+    Args:
+        transform (list): 12-element transformation definition [a, b, c, d, e, f, g, h, i, tx, ty, tz]
+
+    Returns:
+        np.ndarray: 4x4 float64 matrix acting on column vectors [x, y, z, 1]
+
+    Raises:
+        ValueError: If the transform does not contain 12 elements
+    """
+    if len(transform) != 12:
+        raise ValueError("Transform must contain 12 elements")
+
+    return np.array([
+        [transform[0], transform[1], transform[2], transform[9]],
+        [transform[3], transform[4], transform[5], transform[10]],
+        [transform[6], transform[7], transform[8], transform[11]],
+        [0, 0, 0, 1]
+    ], dtype=np.float64)
+
+def apply_transform(point, transform):
+    """
+    Apply a 3D transformation matrix to a point.
+
+    Args:
+        transform (list): 12-element transformation definition [a, b, c, d, e, f, g, h, i, tx, ty, tz]
+        point (list/tuple): 3D point coordinates [x, y, z]
+
+    Returns:
+        list: Transformed point coordinates [x', y', z']
+
+    Raises:
+        ValueError: If input dimensions are invalid
+    """
+    if len(point) != 3:
+        raise ValueError("Point must contain 3 elements")
+
+    return apply_transform_array(np.array([point], dtype=np.float64), transform)[0].tolist()
+
+def apply_transform_array(vertices, transform):
+    """
+    Apply a 3D transformation to all vertices with a single matrix multiply.
+
+    Args:
+        vertices (np.ndarray): float64 array of shape (N, 3)
+        transform: 12-element transformation definition, or a 4x4 matrix
+
+    Returns:
+        np.ndarray: Transformed vertices, shape (N, 3)
+    """
+    matrix = np.asarray(transform, dtype=np.float64)
+    if matrix.shape != (4, 4):
+        matrix = transform_matrix(transform)
+    return vertices @ matrix[:3, :3].T + matrix[:3, 3]
+
+def get_mesh_arrays(mesh):
+    """
+    Convert a mesh element into columnar arrays in one bulk pass.
+
+    Args:
+        mesh: XML mesh element
+
+    Returns:
+        tuple: (vertices float64 array (N, 3), triangles int32 array (M, 3))
+    """
+    vertex_elems = list(mesh.iter('{%s}vertex' % NS_CORE))
+    vertices = np.fromiter(chain.from_iterable(map(itemgetter('x', 'y', 'z'), map(attrgetter('attrib'), vertex_elems))),
+                           dtype=np.float64, count=3 * len(vertex_elems)).reshape(-1, 3)
+
+    triangle_elems = list(mesh.iter('{%s}triangle' % NS_CORE))
+    triangles = np.fromiter(map(int, chain.from_iterable(map(itemgetter('v1', 'v2', 'v3'), map(attrgetter('attrib'), triangle_elems)))),
+                            dtype=np.int32, count=3 * len(triangle_elems)).reshape(-1, 3)
+    return vertices, triangles
+
+def hash_rows(values):
+    """
+    Vectorized 64-bit hash of every row of an integer array (splitmix64-style mixing).
+
+    Args:
+        values (np.ndarray): Integer array of shape (N, K)
+
+    Returns:
+        np.ndarray: uint64 array of shape (N,)
+    """
+    values = np.ascontiguousarray(values).astype(np.int64, copy=False).view(np.uint64)
+    hashes = np.full(len(values), 0x9E3779B97F4A7C15, dtype=np.uint64)
+    for column in values.T:
+        hashes ^= column
+        hashes *= np.uint64(0xBF58476D1CE4E5B9)
+        hashes ^= hashes >> np.uint64(31)
+        hashes *= np.uint64(0x94D049BB133111EB)
+        hashes ^= hashes >> np.uint64(29)
+    return hashes
+
+def mesh_fingerprint(vertices, triangles, tolerance=1e-6):
+    """
+    Order-invariant fingerprint of a mesh: the same set of triangles gives the same fingerprint
+    whatever the order of the vertices, of the triangles, and of the corners inside a triangle.
+
+    Args:
+        vertices (np.ndarray): float64 array (N, 3)
+        triangles (np.ndarray): int array (M, 3)
+        tolerance (float): Quantization step of the coordinates
+
+    Returns:
+        str: Hex digest
+    """
+    quantized = np.round(vertices / tolerance).astype(np.int64)
+    corners = np.sort(hash_rows(quantized)[triangles], axis=1)
+    triangle_hashes = np.sort(hash_rows(corners))
+    return hashlib.sha1(triangle_hashes.tobytes()).hexdigest()
+
+def get_transform_mesh(obj, transform, status=1):
+    """
+    Extract and transform mesh data from an object element.
+
+    Args:
+        obj: XML object element containing mesh data
+        transform: Transformation matrix to apply
+        status: Optional status flag (default: 1)
+
+    Returns:
+        trimesh.Trimesh: Transformed mesh object
+    """
+    mesh = obj.find('.//{%s}mesh' % NS_CORE)
+
+    if mesh is not None:
+        vertices, triangles = get_mesh_arrays(mesh)
+        return trimesh.Trimesh(vertices=apply_transform_array(vertices, transform), faces=triangles)
+
+def get_file_items(filepath):
+    """
+    Extract items section from an XML file.
+
+    :param filepath: Path to the XML file, the model content as bytes, or a ModelDocument
+    :return: List of item elements
+    """
+    return as_model_document(filepath).items
+
+
+XML_NAMESPACE = "http://www.w3.org/XML/1998/namespace"
+_ATTRIB_ENTITIES = {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#9;"}
+
+
+def _open_model_source(source):
+    """
+    Return something ET.iterparse accepts: bytes are wrapped in a file object.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
+def _qualified_name(tag, prefixes):
+    """
+    Convert '{uri}local' to 'prefix:local' (or 'local' for the default namespace).
+    """
+    if tag[0] != "{":
+        return tag
+    uri, local = tag[1:].split("}", 1)
+    prefix = prefixes[uri]
+    return f"{prefix}:{local}" if prefix else local
+
+def _start_tag(elem, prefixes, declarations=()):
+    """
+    Serialize the start tag of elem, without the closing '>'.
+    """
+    parts = ["<", _qualified_name(elem.tag, prefixes)]
+    for prefix, uri in declarations:
+        parts.append(f' xmlns:{prefix}="{escape(uri, _ATTRIB_ENTITIES)}"' if prefix
+                     else f' xmlns="{escape(uri, _ATTRIB_ENTITIES)}"')
+    for key, value in elem.attrib.items():
+        parts.append(f' {_qualified_name(key, prefixes)}="{escape(value, _ATTRIB_ENTITIES)}"')
+    return "".join(parts)
+
+def write_element(write, elem, prefixes, declarations=None):
+    """
+    Serialize an element and its subtree (including its tail) with the document's own prefixes.
+
+    :param write: Callable receiving str chunks
+    :param elem: ET.Element
+    :param prefixes: Dictionary {namespace uri: prefix}
+    :param declarations: Optional dictionary {element: [(prefix, uri)]} of xmlns declarations to emit
+    """
+    declared = declarations.get(elem, ()) if declarations else ()
+    write(_start_tag(elem, prefixes, declared))
+    if len(elem) or elem.text:
+        write(">")
+        if elem.text:
+            write(escape(elem.text))
+        for child in elem:
+            write_element(write, child, prefixes, declarations)
+        write(f"</{_qualified_name(elem.tag, prefixes)}>")
+    else:
+        write(" />")
+    if elem.tail:
+        write(escape(elem.tail))
+
+def stream_model(source, output=None, object_handler=None):
+    """
+    Process a model part with ET.iterparse, one top-level element at a time.
+    Every finished <object> is passed to object_handler (which may edit it in place); the element is
+    then written to output and cleared, so peak memory is bounded by the largest single object
+    instead of the whole document.
+
+    An output path is written through a temporary file in the same directory that replaces it only
+    once the whole source has been read, so source and output may be the same file (in-place disarm).
+
+    :param source: Path to the model file, file object, or the model content as bytes
+    :param output: Optional output path or binary file object for the rewritten model
+    :param object_handler: Optional callable(object element); returning False stops the stream early
+                           (an output path is then left untouched)
+    """
+    target = None
+    if isinstance(output, (str, os.PathLike)):
+        target = output
+        temporary = "%s.%d.tmp" % (os.fspath(target), os.getpid())
+        output = open(temporary, "wb")
+    writer = io.TextIOWrapper(output, encoding="utf-8", write_through=False) if output is not None else None
+    write = writer.write if writer is not None else (lambda text: None)
+
+    prefixes = {XML_NAMESPACE: "xml"}
+    pending, declarations, stack = [], {}, []
+    completed = False
+    try:
+        write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        for event, data in ET.iterparse(_open_model_source(source), events=("start-ns", "start", "end")):
+            if event == "start-ns":
+                prefix, uri = data
+                prefixes.setdefault(uri, prefix)
+                pending.append(data)
+            elif event == "start":
+                if pending:
+                    declarations[data] = pending
+                    pending = []
+                stack.append(data)
+                # <model> and <resources> are written as open containers, everything below them as a whole
+                if len(stack) == 1 or (len(stack) == 2 and data.tag == "{%s}resources" % NS_CORE):
+                    write(_start_tag(data, prefixes, declarations.pop(data, ())) + ">\n")
+            else:
+                stack.pop()
+                depth = len(stack)
+                is_container = depth == 0 or (depth == 1 and data.tag == "{%s}resources" % NS_CORE)
+                if is_container:
+                    write(f"</{_qualified_name(data.tag, prefixes)}>\n")
+                elif depth == 1 or (depth == 2 and stack[1].tag == "{%s}resources" % NS_CORE):
+                    if data.tag == "{%s}object" % NS_CORE and object_handler is not None:
+                        if object_handler(data) is False:
+                            return
+                    write_element(write, data, prefixes, declarations)
+                    # Drop the finished element so the parsed tree never grows beyond one object
+                    for elem in data.iter():
+                        declarations.pop(elem, None)
+                    stack[-1].remove(data)
+        completed = True
+    finally:
+        if writer is not None:
+            writer.flush()
+            writer.detach()
+        if target is not None:
+            output.close()
+            if completed:
+                if os.path.exists(target):
+                    shutil.copymode(target, temporary)
+                os.replace(temporary, target)
+            else:
+                os.remove(temporary)
+
+def _plain_children(elem, tag, attribute_count, count):
+    """
+    True if elem has exactly count children, all with the given tag, attribute_count attributes and
+    no sub-elements, so that they can be written back from the mesh arrays.
+    """
+    return len(elem) == count and count > 0 and \
+        set(map(attrgetter('tag'), elem)) == {tag} and \
+        set(map(len, map(attrgetter('attrib'), elem))) == {attribute_count} and \
+        not any(map(len, elem))
+
+def write_model(doc, output, chunk_rows=1 << 16):
+    """
+    Write a ModelDocument element by element with stable two-space indentation, without the
+    recursive indent pass and without serializing the whole document in memory.
+    Plain <vertices> (x, y, z only) and <triangles> (v1, v2, v3 only) blocks of the indexed meshes
+    are written straight from the mesh arrays in chunks of chunk_rows rows; every other element is
+    written from the tree with the document's own namespace prefixes.
+
+    :param doc: ModelDocument
+    :param output: Output path or binary file object
+    :param chunk_rows: Number of vertex or triangle rows formatted per write
+    """
+    prefixes = doc.prefixes
+    vertex_tag, triangle_tag = '{%s}vertex' % NS_CORE, '{%s}triangle' % NS_CORE
+
+    # Blocks that can be written from the arrays: {vertices or triangles element: (row template, array)}
+    blocks = {}
+    for obj_id, mesh in doc.meshes.items():
+        vertices, triangles = doc.mesh_arrays(obj_id)
+        vertices_elem = mesh.find('{%s}vertices' % NS_CORE)
+        triangles_elem = mesh.find('{%s}triangles' % NS_CORE)
+        if vertices_elem is not None and _plain_children(vertices_elem, vertex_tag, 3, len(vertices)):
+            template = '<%s x="%%r" y="%%r" z="%%r" />' % _qualified_name(vertex_tag, prefixes)
+            blocks[vertices_elem] = (template, vertices)
+        if triangles_elem is not None and _plain_children(triangles_elem, triangle_tag, 3, len(triangles)):
+            template = '<%s v1="%%d" v2="%%d" v3="%%d" />' % _qualified_name(triangle_tag, prefixes)
+            blocks[triangles_elem] = (template, triangles)
+
+    close = False
+    if isinstance(output, (str, os.PathLike)):
+        output, close = open(output, "wb"), True
+    writer = io.TextIOWrapper(output, encoding="utf-8", write_through=False)
+    write = writer.write
+
+    def write_block(elem, level):
+        # <vertices> / <triangles> from the arrays, one formatted chunk per write
+        template, array = blocks[elem]
+        row = "\n" + "  " * (level + 1) + template
+        write(_start_tag(elem, prefixes) + ">")
+        for start in range(0, len(array), chunk_rows):
+            write("".join(row % values for values in map(tuple, array[start:start + chunk_rows].tolist())))
+        write("\n" + "  " * level + "</%s>" % _qualified_name(elem.tag, prefixes))
+
+    def write_indented(elem, level, declarations=()):
+        name = _qualified_name(elem.tag, prefixes)
+        text = elem.text if elem.text and elem.text.strip() else None
+        if len(elem) == 0:
+            if text is None:
+                write(_start_tag(elem, prefixes, declarations) + " />")
+            else:
+                write(_start_tag(elem, prefixes, declarations) + ">" + escape(text) + "</%s>" % name)
+            return
+        write(_start_tag(elem, prefixes, declarations) + ">")
+        if text is not None:
+            write(escape(text))
+        for child in elem:
+            write("\n" + "  " * (level + 1))
+            if child in blocks:
+                write_block(child, level + 1)
+            else:
+                write_indented(child, level + 1)
+            if child.tail and child.tail.strip():
+                write(escape(child.tail))
+        write("\n" + "  " * level + "</%s>" % name)
+
+    try:
+        write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        write_indented(doc.root, 0, doc.declarations)
+        write("\n")
+    finally:
+        writer.flush()
+        writer.detach()
+        if close:
+            output.close()
+
+def iter_model_objects(source):
+    """
+    Stream the <object> elements of a model part with constant memory.
+    Each object is cleared as soon as the consumer asks for the next one.
+
+    :param source: Path to the model file, file object, or the model content as bytes
+    :return: Generator of object elements
+    """
+    stack = []
+    for event, elem in ET.iterparse(_open_model_source(source), events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        if elem.tag == "{%s}object" % NS_CORE:
+            yield elem
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+        elif len(stack) <= 1:
+            # Finished top-level sections (metadata, build) are not needed either
+            elem.clear()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules of Z3_CDR_3MF are imported by name, as the scripts of the folder do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+import trimesh
+
+import Hollow_Embedding_CDR as MC
+
+
+def scene():
+    # Container, a box inside it, a box sticking out of it, a box touching its inner face, a separate box
+    return [trimesh.creation.box(extents=(10, 10, 10)),
+            trimesh.creation.box(extents=(2, 2, 2)),
+            trimesh.creation.box(extents=(2, 2, 2), transform=trimesh.transformations.translation_matrix((5, 0, 0))),
+            trimesh.creation.box(extents=(2, 2, 2), transform=trimesh.transformations.translation_matrix((4, 0, 0))),
+            trimesh.creation.box(extents=(2, 2, 2), transform=trimesh.transformations.translation_matrix((20, 0, 0)))]
+
+
+def test_experimental_backend_requires_flag():
+    with pytest.raises(ValueError, match="experimental"):
+        MC.matrix_mosaic_judge(scene(), backend="open3d", memo=False)
+    with pytest.raises(ValueError, match="Unknown"):
+        MC.matrix_mosaic_judge(scene(), backend="embree", memo=False)
+
+
+def test_open3d_parity_with_trimesh():
+    pytest.importorskip("open3d")
+    meshes = scene()
+    # Rotated container around the separate box
+    rotated = trimesh.transformations.rotation_matrix(np.pi / 7, (0, 0, 1))
+    rotated[:3, 3] = (20, 0, 0)
+    meshes.append(trimesh.creation.box(extents=(6, 6, 6), transform=rotated))
+
+    reference = MC.matrix_mosaic_judge(meshes, memo=False)
+    assert reference == [False, True, False, True, True, False]
+    assert MC.matrix_mosaic_judge(meshes, backend="open3d", memo=False, experimental=True) == reference
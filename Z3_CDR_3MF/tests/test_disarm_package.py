@@ -0,0 +1,110 @@
+import zipfile
+
+import pytest
+
+import Fused_scan_CDR as FS
+
+NS_CORE = "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"
+NS_PRODUCTION = "http://schemas.microsoft.com/3dmanufacturing/production/2015/06"
+MODEL_TYPE = "http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"
+CONTENT_TYPES = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                 '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                 '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+                 '</Types>')
+
+
+def relationships(*targets):
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">%s</Relationships>'
+            % "".join('<Relationship Target="%s" Id="rel%d" Type="%s"/>' % (target, index, MODEL_TYPE)
+                      for index, target in enumerate(targets)))
+
+
+def cube(obj_id, size=10.0):
+    vertices = [(x, y, z) for x in (0, size) for y in (0, size) for z in (0, size)]
+    triangles = [(0, 2, 1), (1, 2, 3), (4, 5, 6), (5, 7, 6), (0, 1, 4), (1, 5, 4),
+                 (2, 6, 3), (3, 6, 7), (0, 4, 2), (2, 4, 6), (1, 3, 5), (3, 7, 5)]
+    return ('<object id="%s" type="model"><mesh><vertices>%s</vertices><triangles>%s</triangles></mesh></object>'
+            % (obj_id, "".join('<vertex x="%s" y="%s" z="%s"/>' % vertex for vertex in vertices),
+               "".join('<triangle v1="%d" v2="%d" v3="%d"/>' % triangle for triangle in triangles)))
+
+
+def model(resources="", build=""):
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n<model unit="millimeter" xmlns="%s" xmlns:p="%s">'
+            '<resources>%s</resources><build>%s</build></model>' % (NS_CORE, NS_PRODUCTION, resources, build))
+
+
+def write_package(path, root_model, parts):
+    """
+    Production package: 3D/3dmodel.model is the start part, the other parts are reached through
+    3D/_rels/3dmodel.model.rels
+    """
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", CONTENT_TYPES)
+        package.writestr("_rels/.rels", relationships("/3D/3dmodel.model"))
+        package.writestr("3D/3dmodel.model", root_model)
+        package.writestr("3D/_rels/3dmodel.model.rels", relationships(*("/" + name for name in parts)))
+        for name, content in parts.items():
+            package.writestr(name, content)
+    return str(path)
+
+
+def test_root_part_with_only_path_items(tmp_path):
+    # Spec-style package: the root part has no objects, the object part has no build items
+    root_model = model(build='<item objectid="1" p:path="/3D/object_a.model"/>'
+                             '<item objectid="2" p:path="/3D/object_a.model"/>')
+    filepath = write_package(tmp_path / "production.3mf", root_model,
+                             {"3D/object_a.model": model(cube(1) + cube(2, 2.0))})
+
+    verdict = FS.disarm_package(filepath, str(tmp_path / "defended.3mf"), workers=1)
+
+    assert verdict['max_depth'] == 1
+    for report in verdict['parts'].values():
+        assert report['repetition'] == [] and report['hollow'] == []
+
+
+def test_circular_reference_across_parts(tmp_path):
+    # 3D/3dmodel.model#1 -> 3D/b.model#1 -> 3D/3dmodel.model#1: no part has a cycle of its own
+    root_model = model('<object id="1" type="model"><components>'
+                       '<component objectid="1" p:path="/3D/b.model"/></components></object>',
+                       '<item objectid="1"/>')
+    part_b = model('<object id="1" type="model"><components>'
+                   '<component objectid="1" p:path="/3D/3dmodel.model"/></components></object>')
+    filepath = write_package(tmp_path / "cycle.3mf", root_model, {"3D/b.model": part_b})
+
+    with pytest.raises(EOFError, match="circular reference"):
+        FS.disarm_package(filepath, str(tmp_path / "defended.3mf"), workers=1)
+
+
+def test_depth_across_parts(tmp_path):
+    # Each part is one level deep on its own, the package chains them to depth 3
+    root_model = model('<object id="1" type="model"><components>'
+                       '<component objectid="5" p:path="/3D/b.model"/></components></object>',
+                       '<item objectid="1"/>')
+    part_b = model('<object id="5" type="model"><components><component objectid="6"/></components></object>'
+                   + cube(6))
+    filepath = write_package(tmp_path / "deep.3mf", root_model, {"3D/b.model": part_b})
+
+    assert FS.disarm_package(filepath, str(tmp_path / "defended.3mf"), workers=1)['max_depth'] == 3
+    with pytest.raises(EOFError):
+        FS.disarm_package(filepath, str(tmp_path / "defended.3mf"), workers=1, reject_depth=3)
+
+
+def test_max_depth_across_parts(tmp_path):
+    # Neither part reaches max_depth on its own: the geometry detectors are skipped for the package
+    root_model = model('<object id="1" type="model"><components>'
+                       '<component objectid="5" p:path="/3D/b.model"/></components></object>',
+                       '<item objectid="1"/>')
+    part_b = model('<object id="5" type="model"><components><component objectid="6"/></components></object>'
+                   + cube(6))
+    filepath = write_package(tmp_path / "deep.3mf", root_model, {"3D/b.model": part_b})
+
+    scanned = FS.disarm_package(filepath, str(tmp_path / "scanned.3mf"), workers=1, max_depth=4)
+    assert scanned['skipped'] == [] and scanned['parts']['3D/b.model']['steganographic']
+
+    verdict = FS.disarm_package(filepath, str(tmp_path / "skipped.3mf"), workers=1, max_depth=3)
+    assert verdict['max_depth'] == 3
+    assert sorted(verdict['skipped']) == ["3D/3dmodel.model", "3D/b.model"]
+    assert not verdict['parts']['3D/b.model']['steganographic']
+    assert not verdict['defended']
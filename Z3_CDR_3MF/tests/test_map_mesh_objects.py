@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import file_handle as fd
+
+NS_CORE = "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"
+TETRAHEDRON = ([(0, 0, 0), (10, 0, 0), (0, 10, 0), (0, 0, 10)], [(1, 2, 0), (3, 1, 0), (2, 3, 0), (3, 2, 1)])
+
+
+def rows(obj_id, vertex='<{p}vertex x="{0!r}" y="{1!r}" z="{2!r}"/>',
+         triangle='<{p}triangle v1="{0}" v2="{1}" v3="{2}"/>', prefix="", extra=""):
+    vertices, triangles = TETRAHEDRON
+    shift = float(obj_id)
+    return ('<{p}object id="%s" type="model"><{p}mesh><{p}vertices>%s</{p}vertices>%s<{p}triangles>%s</{p}triangles>'
+            '</{p}mesh></{p}object>' % (obj_id, "".join(vertex.format(x + shift, y, z, p="{p}") for x, y, z in vertices),
+                                        extra, "".join(triangle.format(*t, p="{p}") for t in triangles))).format(p=prefix)
+
+
+def model(objects, prefix=""):
+    declaration = 'xmlns:%s="%s"' % (prefix[:-1], NS_CORE) if prefix else 'xmlns="%s"' % NS_CORE
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n<{p}model unit="millimeter" %s><{p}resources>%s</{p}resources>'
+            '<{p}build/></{p}model>' % (declaration, "".join(objects))).format(p=prefix).encode()
+
+
+def shapes(vertices, triangles):
+    return vertices.tolist(), triangles.tolist()
+
+
+LAYOUTS = {
+    "plain": model([rows(1), rows(2), rows(3)]),
+    "prefixed": model([rows(1, prefix="m:"), rows(2, prefix="m:")], prefix="m:"),
+    "comment": model([rows(1, extra="<!-- <vertex x='9' y='9' z='9'/> -->"), rows(2)]),
+    "attributes": model([rows(1, triangle='<{p}triangle v1="{0}" v2="{1}" v3="{2}" pid="1" p1="0"/>'),
+                         rows(2, vertex="<{p}vertex z='{2!r}' y='{1!r}' x='{0!r}'/>")]),
+    "commented object": model(['<!-- <object id="9"></object> -->', rows(1), rows(2)]),
+    "entity": model([rows(1, vertex='<{p}vertex x="&#49;{0!r}" y="{1!r}" z="{2!r}"/>'), rows(2)]),
+}
+
+
+@pytest.mark.parametrize("layout", sorted(LAYOUTS))
+def test_workers_convert_like_the_parent(tmp_path, layout):
+    path = tmp_path / "3dmodel.model"
+    path.write_bytes(LAYOUTS[layout])
+    reference = fd.ModelDocument(str(path))
+    expected = {obj_id: shapes(*reference.mesh_arrays(obj_id)) for obj_id in reference.meshes}
+
+    for source in (str(path), LAYOUTS[layout]):
+        doc = fd.ModelDocument(source)
+        assert fd.map_mesh_objects(doc, shapes, workers=2) == expected
+        # The arrays converted by the workers fill the document's cache
+        for obj_id in doc.meshes:
+            assert doc._mesh_arrays[obj_id][0].dtype == np.float64
+            assert shapes(*doc._mesh_arrays[obj_id]) == expected[obj_id]
+
+
+def test_edited_mesh_is_not_read_from_the_source(tmp_path):
+    path = tmp_path / "3dmodel.model"
+    path.write_bytes(LAYOUTS["plain"])
+    doc = fd.ModelDocument(str(path))
+    doc.keep_triangles("2", np.array([True, False, True, False]))
+    doc.reindex()
+
+    assert fd.map_mesh_objects(doc, shapes, workers=2)["2"] == shapes(*doc.mesh_arrays("2"))
+    assert len(fd.map_mesh_objects(doc, shapes, workers=2)["2"][1]) == 2
+
+
+def test_source_rewritten_after_parse(tmp_path):
+    path = tmp_path / "3dmodel.model"
+    path.write_bytes(LAYOUTS["plain"])
+    doc = fd.ModelDocument(str(path))
+    assert sorted(doc.object_ranges()) == ["1", "2", "3"]
+    # In-place disarm of another document: the file no longer matches this one
+    path.write_bytes(model([rows(3), rows(1), rows(2)]))
+
+    assert fd.map_mesh_objects(doc, shapes, workers=2) == {obj_id: shapes(*doc.mesh_arrays(obj_id)) for obj_id in "123"}
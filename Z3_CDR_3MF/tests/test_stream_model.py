@@ -0,0 +1,41 @@
+import os
+import shutil
+
+import file_handle as fd
+import Steganographic_CDR as SC
+
+MODEL = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+         '<model unit="millimeter" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
+         '<resources><object id="1" type="model"><mesh><vertices>'
+         '<vertex x="0" y="0" z="0"/><vertex x="10" y="0" z="0"/><vertex x="0" y="10" z="0"/><vertex x="0" y="0" z="10"/>'
+         '</vertices><triangles>'
+         '<triangle v1="1" v2="2" v3="0"/><triangle v1="3" v2="1" v3="0"/>'
+         '<triangle v1="2" v2="3" v3="0"/><triangle v1="3" v2="2" v3="1"/>'
+         '</triangles></mesh></object></resources>'
+         '<build><item objectid="1"/></build></model>')
+
+
+def test_streaming_defense_in_place(tmp_path):
+    # The repo disarms in place: the same path for the input and the output
+    model_file = tmp_path / "3dmodel.model"
+    model_file.write_text(MODEL)
+    reference = tmp_path / "reference.model"
+    SC.Steg_basic_CDR(str(model_file), str(reference))
+
+    SC.Steg_basic_CDR(str(model_file), str(model_file), streaming=True)
+
+    assert sorted(os.listdir(tmp_path)) == ["3dmodel.model", "reference.model"]
+    defended, expected = fd.ModelDocument(str(model_file)), fd.ModelDocument(str(reference))
+    assert (defended.mesh_arrays("1")[1] == expected.mesh_arrays("1")[1]).all()
+
+
+def test_stream_stopped_early_leaves_output(tmp_path):
+    model_file = tmp_path / "3dmodel.model"
+    model_file.write_text(MODEL)
+    original = tmp_path / "original.model"
+    shutil.copy(model_file, original)
+
+    fd.stream_model(str(model_file), str(model_file), lambda obj: False)
+
+    assert model_file.read_bytes() == original.read_bytes()
+    assert sorted(os.listdir(tmp_path)) == ["3dmodel.model", "original.model"]
@@ -1,134 +1,203 @@
-from stl import mesh
-
-
-def swap_lists(lst1, lst2):
-    """
-    Swap the contents of two lists (deep copy)
-
-    Args:
-        lst1: First list to swap
-        lst2: Second list to swap
-    Note:
-        Modifies the lists in-place and doesn't return anything
-    """
-    temp = lst1.copy()
-    lst1[:] = lst2
-    lst2[:] = temp
-
-
-def equal_lists(lst1, lst2):
-    """
-    Check if two lists are exactly equal (doesn't support nested lists)
-
-    Args:
-        lst1: First list to compare
-        lst2: Second list to compare
-    Returns:
-        bool: True if lists are identical, False otherwise
-    Raises:
-        EOFError: If lists have different lengths
-    """
-    if len(lst1) != len(lst2):
-        raise EOFError("Lists must be of equal length")
-
-    for i in range(len(lst1)):
-        if lst1[i] != lst2[i]:
-            return False
-    return True
-
-
-def sel_ver(ver1, ver2):
-    """
-    Determine the order of two 3D vertices based on specific rules:
-    1. Compare sum of coordinates (x+y+z), return vertex with larger sum
-    2. If sums are equal, compare x, then y, then z coordinates
-    3. Return the vertex that comes first in the ordering
-
-    Args:
-        ver1: First 3D vertex [x,y,z]
-        ver2: Second 3D vertex [x,y,z]
-    Returns:
-        list: The selected vertex
-    Raises:
-        EOFError: If vertices have different dimensions or identical coordinates
-    """
-    if len(ver1) != len(ver2):
-        raise EOFError("Vertices must have same dimensions")
-
-    sum1, sum2 = sum(ver1), sum(ver2)
-    if sum1 > sum2:
-        return ver1
-    elif sum1 < sum2:
-        return ver2
-
-    # Compare coordinates sequentially
-    for i in range(3):
-        if ver1[i] < ver2[i]:
-            return ver1
-        elif ver1[i] > ver2[i]:
-            return ver2
-
-    raise EOFError("Vertices have identical coordinates")
-
-
-def Steganographic_Decrypt(filepath, Num_bit):
-    """
-    Perform bit-level analysis on STL file to detect steganography patterns
-
-    Args:
-        filepath: Path to STL file
-        Num_bit: Number of bits to analyze
-    Returns:
-        list: Binary sequence indicating detected patterns (1 for match, 0 otherwise)
-    """
-    temp_mesh = mesh.Mesh.from_file(filepath)
-    decryption = []
-
-    for ver in temp_mesh.vectors:
-        res = equal_lists(ver[0], sel_ver(ver[0], sel_ver(ver[1], ver[2])))
-        decryption.append(int(res))
-
-    return decryption[:Num_bit]
-
-
-def Steganographic_Defense(infilepath, outfilepath):
-    """
-    Defend against SGOP attack by normalizing vertex ordering in triangles
-
-    Args:
-        infilepath: Input STL file path
-        outfilepath: Output STL file path
-    """
-    temp_mesh = mesh.Mesh.from_file(infilepath)
-
-    for ver in temp_mesh.vectors:
-        # Check current vertex ordering
-        if equal_lists(ver[0], sel_ver(ver[0], sel_ver(ver[1], ver[2]))):
-            continue
-
-        # Reorder vertices to match expected pattern
-        if equal_lists(ver[1], sel_ver(ver[1], sel_ver(ver[0], ver[2]))):
-            swap_lists(ver[0], ver[1])
-            swap_lists(ver[1], ver[2])
-        else:
-            swap_lists(ver[0], ver[2])
-            swap_lists(ver[1], ver[2])
-
-    temp_mesh.save(outfilepath)
-
-
-def Steganographic_detection(filepath):
-    """
-    Detect potential steganography in STL files
-
-    Args:
-        filepath: Path to STL file to analyze
-    Returns:
-        bool: True if steganography is detected, False otherwise
-    """
-    temp_mesh = mesh.Mesh.from_file(filepath)
-
-    for ver in temp_mesh.vectors:
-        if not equal_lists(ver[0], sel_ver(ver[0], sel_ver(ver[1], ver[2]))):
-            return True
+import numpy as np
+import file_handle as fd
+
+
+def swap_lists(lst1, lst2):
+    """
+    Swap the contents of two lists (deep copy)
+
+    Args:
+        lst1: First list to swap
+        lst2: Second list to swap
+    Note:
+        Modifies the lists in-place and doesn't return anything
+    """
+    temp = lst1.copy()
+    lst1[:] = lst2
+    lst2[:] = temp
+
+
+def equal_lists(lst1, lst2):
+    """
+    Check if two lists are exactly equal (doesn't support nested lists)
+
+    Args:
+        lst1: First list to compare
+        lst2: Second list to compare
+    Returns:
+        bool: True if lists are identical, False otherwise
+    Raises:
+        EOFError: If lists have different lengths
+    """
+    if len(lst1) != len(lst2):
+        raise EOFError("Lists must be of equal length")
+
+    for i in range(len(lst1)):
+        if lst1[i] != lst2[i]:
+            return False
+    return True
+
+
+def sel_ver(ver1, ver2):
+    """
+    Determine the order of two 3D vertices based on specific rules:
+    1. Compare sum of coordinates (x+y+z), return vertex with larger sum
+    2. If sums are equal, compare x, then y, then z coordinates
+    3. Return the vertex that comes first in the ordering
+
+    Args:
+        ver1: First 3D vertex [x,y,z]
+        ver2: Second 3D vertex [x,y,z]
+    Returns:
+        list: The selected vertex
+    Raises:
+        EOFError: If vertices have different dimensions or identical coordinates
+    """
+    if len(ver1) != len(ver2):
+        raise EOFError("Vertices must have same dimensions")
+
+    sum1, sum2 = sum(ver1), sum(ver2)
+    if sum1 > sum2:
+        return ver1
+    elif sum1 < sum2:
+        return ver2
+
+    # Compare coordinates sequentially
+    for i in range(3):
+        if ver1[i] < ver2[i]:
+            return ver1
+        elif ver1[i] > ver2[i]:
+            return ver2
+
+    raise EOFError("Vertices have identical coordinates")
+
+
+def vertex_precedes(ver1, ver2):
+    """
+    Vectorized sel_ver over arrays of vertices
+
+    Args:
+        ver1: float array (N, 3) of first vertices
+        ver2: float array (N, 3) of second vertices
+    Returns:
+        tuple: (selected, tie) boolean arrays (N,); selected where sel_ver returns ver1, tie where
+               sel_ver raises (identical coordinates)
+    """
+    # Same float32 accumulation as sum() over a vertex of the mesh
+    sum1 = ver1[:, 0] + ver1[:, 1] + ver1[:, 2]
+    sum2 = ver2[:, 0] + ver2[:, 1] + ver2[:, 2]
+    selected = sum1 > sum2
+    undecided = ~selected & ~(sum1 < sum2)
+
+    # Compare coordinates sequentially
+    for i in range(3):
+        smaller, larger = ver1[:, i] < ver2[:, i], ver1[:, i] > ver2[:, i]
+        selected |= undecided & smaller
+        undecided &= ~smaller & ~larger
+    return selected, undecided
+
+
+def selected_vertex_index(vectors):
+    """
+    Position of the vertex selected by sel_ver(ver[0], sel_ver(ver[1], ver[2])) in every triangle
+
+    Args:
+        vectors: float array (N, 3, 3) of triangles
+    Returns:
+        tuple: (index array (N,) of 0, 1 or 2, boolean array (N,) of the triangles where sel_ver raises)
+    """
+    first12, tie12 = vertex_precedes(vectors[:, 1], vectors[:, 2])
+    first0, tie0 = vertex_precedes(vectors[:, 0], np.where(first12[:, None], vectors[:, 1], vectors[:, 2]))
+    index = np.where(first0, 0, np.where(first12, 1, 2))
+    return index, tie12 | tie0
+
+
+def rotate_vertices(vectors, index):
+    """
+    Rotate the vertices of every triangle so that vertex index comes first (winding is kept)
+
+    Args:
+        vectors: float array (N, 3, 3) of triangles
+        index: int array (N,) of the vertex to bring first
+    Returns:
+        numpy.ndarray: Rotated copy of vectors
+    """
+    order = (np.arange(3) + np.asarray(index)[:, None]) % 3
+    return np.take_along_axis(vectors, order[:, :, None], axis=1)
+
+
+def Steganographic_Decrypt(filepath, Num_bit):
+    """
+    Perform bit-level analysis on STL file to detect steganography patterns
+
+    Args:
+        filepath: Path to STL file
+        Num_bit: Number of bits to analyze
+    Returns:
+        list: Binary sequence indicating detected patterns (1 for match, 0 otherwise)
+    Raises:
+        EOFError: If a triangle has vertices with identical coordinates (see sel_ver)
+    """
+    data = fd.load_stl(filepath)
+    decryption = []
+
+    for rows in fd.iter_chunks(len(data)):
+        index, tie = selected_vertex_index(data['vectors'][rows])
+        if tie.any():
+            raise EOFError("Vertices have identical coordinates")
+        decryption.extend((index == 0).astype(int).tolist())
+
+    return decryption[:Num_bit]
+
+
+def Steganographic_Defense(infilepath, outfilepath):
+    """
+    Defend against SGOP attack by normalizing vertex ordering in triangles
+
+    Args:
+        infilepath: Input STL file path
+        outfilepath: Output STL file path
+    Raises:
+        EOFError: If a triangle has vertices with identical coordinates (see sel_ver); nothing is written
+    """
+    data = fd.load_stl(infilepath)
+
+    # Check every triangle before writing anything, as sel_ver would raise on identical vertices
+    for rows in fd.iter_chunks(len(data)):
+        vectors = data['vectors'][rows]
+        index, tie = selected_vertex_index(vectors)
+        # Reordering compares ver[0] and ver[2] again
+        tie |= (index != 0) & vertex_precedes(vectors[:, 0], vectors[:, 2])[1]
+        if tie.any():
+            raise EOFError("Vertices have identical coordinates")
+
+    def reorder(records):
+        # Rotate the vertices so that the selected vertex comes first
+        records['vectors'] = rotate_vertices(records['vectors'], selected_vertex_index(records['vectors'])[0])
+        return records
+
+    fd.write_stl(outfilepath, data, convert=reorder)
+
+
+def Steganographic_detection(filepath):
+    """
+    Detect potential steganography in STL files
+
+    Args:
+        filepath: Path to STL file to analyze
+    Returns:
+        bool: True if steganography is detected, False otherwise
+    Raises:
+        EOFError: If a triangle met before the first reordered one has vertices with identical coordinates
+    """
+    data = fd.load_stl(filepath)
+
+    for rows in fd.iter_chunks(len(data)):
+        index, tie = selected_vertex_index(data['vectors'][rows])
+        # The first triangle that is not in order, unless sel_ver raises before it
+        events = np.flatnonzero((index != 0) | tie)
+        if len(events):
+            if tie[events[0]]:
+                raise EOFError("Vertices have identical coordinates")
+            return True
     return False
\ No newline at end of file
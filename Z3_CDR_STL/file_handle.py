@@ -0,0 +1,327 @@
+from stl import mesh
+import numpy as np
+import datetime
+import tempfile
+import struct
+import os
+
+#: Size of the binary STL header
+HEADER_SIZE = 80
+#: Size of the triangle count that follows the header
+COUNT_SIZE = 4
+#: Record of one triangle: normal, three vertices and the 2-byte attribute (50 bytes, as in numpy-stl)
+STL_DTYPE = mesh.Mesh.dtype
+#: Format of the header written in front of the defended files (80 bytes at most)
+HEADER_FORMAT = 'Z3CDR ({now}) {name}'
+#: Number of triangles processed at a time by the chunked helpers
+CHUNK_ROWS = 1 << 18
+
+
+def read_stl_layout(filepath):
+    """
+    Read the structure of an STL file without reading its triangles
+
+    Args:
+        filepath: Path to the STL file
+    Returns:
+        tuple: (header bytes, triangle count or None, file size); the count is None when the file
+               is too short to hold one
+    """
+    size = os.path.getsize(filepath)
+    with open(filepath, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+        count_data = f.read(COUNT_SIZE)
+    if len(header) != HEADER_SIZE or len(count_data) != COUNT_SIZE:
+        return header, None, size
+    return header, struct.unpack('<I', count_data)[0], size
+
+
+def load_stl(filepath):
+    """
+    Open an STL file as a structured array of triangle records ('normals', 'vectors', 'attr')
+
+    A binary STL is memory-mapped read-only after its header, triangle count and length have been
+    checked: nothing is read or copied up front, so multi-GB files open instantly, and worker
+    processes mapping the same file share its pages. An ASCII STL is parsed with numpy-stl.
+
+    Args:
+        filepath: Path to the STL file
+    Returns:
+        numpy.ndarray: Records with dtype STL_DTYPE (a read-only numpy.memmap for binary files)
+    Raises:
+        EOFError: If the file is neither a well-formed binary STL nor an ASCII STL
+    """
+    header, count, size = read_stl_layout(filepath)
+    if count is not None and size == HEADER_SIZE + COUNT_SIZE + count * STL_DTYPE.itemsize:
+        if count == 0:
+            return np.zeros(0, dtype=STL_DTYPE)
+        return np.memmap(filepath, dtype=STL_DTYPE, mode='r', offset=HEADER_SIZE + COUNT_SIZE, shape=(count,))
+
+    if header.lstrip().lower().startswith(b'solid'):
+        return mesh.Mesh.from_file(filepath).data
+    if count is None:
+        raise EOFError("File is too short for a binary STL header: %d bytes" % size)
+    raise EOFError("Binary STL size %d does not match its %d triangles (expected %d bytes)"
+                   % (size, count, HEADER_SIZE + COUNT_SIZE + count * STL_DTYPE.itemsize))
+
+
+def iter_chunks(count, chunk_rows=CHUNK_ROWS):
+    """
+    Split a number of records into consecutive slices
+
+    Args:
+        count: Number of records
+        chunk_rows: Number of records per slice
+    Returns:
+        generator: slice objects covering range(count)
+    """
+    for start in range(0, count, chunk_rows):
+        yield slice(start, min(start + chunk_rows, count))
+
+
+def write_stl(output_path, data, keep=None, convert=None, chunk_rows=CHUNK_ROWS):
+    """
+    Write triangle records as a binary STL file, one chunk at a time
+
+    The normals are recalculated from the vertices, as numpy-stl does when saving, and a new header
+    is written (nothing of the input header is kept).
+
+    Args:
+        output_path: Path of the output STL file
+        data: Structured array of records with dtype STL_DTYPE (e.g. the result of load_stl)
+        keep: Optional boolean mask of the records to write, in their original order
+        convert: Optional function(records) returning the records to write for a chunk; it receives
+                 a writable copy of the chunk, before keep is applied
+        chunk_rows: Number of records read and written at a time
+    """
+    count = len(data) if keep is None else int(np.count_nonzero(keep))
+    header = HEADER_FORMAT.format(now=datetime.datetime.now(), name=os.path.basename(str(output_path)))
+    with open(output_path, 'wb') as f:
+        f.write(header.encode('ascii', 'replace')[:HEADER_SIZE].ljust(HEADER_SIZE, b' '))
+        f.write(struct.pack('<I', count))
+        for rows in iter_chunks(len(data), chunk_rows):
+            records = np.array(data[rows], dtype=STL_DTYPE)
+            if convert is not None:
+                records = convert(records)
+            if keep is not None:
+                records = records[keep[rows]]
+            vectors = records['vectors']
+            records['normals'] = np.cross(vectors[:, 1] - vectors[:, 0], vectors[:, 2] - vectors[:, 0])
+            f.write(records.tobytes())
+
+
+#: Odd 64-bit multiplier of the triangle hash
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+#: One opaque key per triangle: its 36 coordinate bytes
+KEY_DTYPE = np.dtype((np.void, 36))
+
+
+def triangle_keys(vectors):
+    """
+    Coordinate bits of every triangle, -0.0 being folded into +0.0 so that keys are equal exactly
+    when the coordinates compare equal
+
+    Args:
+        vectors: float32 array (N, 3, 3) of triangles
+    Returns:
+        numpy.ndarray: Contiguous uint32 array (N, 9)
+    """
+    return np.ascontiguousarray(np.asarray(vectors, dtype=np.float32) + np.float32(0)).reshape(-1, 9).view(np.uint32)
+
+
+def hash_triangles(vectors, seed=0):
+    """
+    64-bit hash of the 36 coordinate bytes of every triangle
+
+    Args:
+        vectors: float32 array (N, 3, 3) of triangles, or the uint32 array (N, 9) of triangle_keys
+        seed: 64-bit seed mixed into the hash
+    Returns:
+        numpy.ndarray: uint64 array (N,)
+    """
+    keys = vectors if vectors.dtype == np.uint32 else triangle_keys(vectors)
+    hashes = keys[:, 0].astype(np.uint64) ^ np.uint64(seed)
+    for i in range(1, 9):
+        hashes *= HASH_MULTIPLIER
+        hashes ^= keys[:, i]
+    return hashes
+
+
+def unique_triangles(vectors, chunk_rows=CHUNK_ROWS):
+    """
+    First occurrence and number of occurrences of every distinct triangle
+
+    Triangles are hashed on their 36 coordinate bytes (one opaque key each), sorted by hash, and
+    every hash group is checked byte for byte against its first triangle; the rare groups that mix
+    different triangles are split exactly. Triangles with a NaN coordinate never compare equal, so
+    each of them is its own group.
+
+    Args:
+        vectors: float32 array (N, 3, 3) of triangles (e.g. load_stl(path)['vectors'])
+        chunk_rows: Number of triangles hashed and compared at a time
+    Returns:
+        tuple: (first, counts) int64 arrays with one entry per distinct triangle, in file order:
+               index of its first occurrence and number of occurrences
+    """
+    count = len(vectors)
+    hashes = np.empty(count, dtype=np.uint64)
+    valid = np.empty(count, dtype=bool)
+    for rows in iter_chunks(count, chunk_rows):
+        chunk = vectors[rows]
+        hashes[rows] = hash_triangles(chunk)
+        valid[rows] = ~np.isnan(chunk).any(axis=(1, 2))
+    # Group equal hashes: smallest index and size of every group
+    if valid.all():
+        order = np.argsort(hashes)
+    else:
+        candidates = np.flatnonzero(valid)
+        order = candidates[np.argsort(hashes[candidates])]
+    sorted_hashes = hashes[order]
+    starts = np.flatnonzero(np.concatenate([[len(order) > 0], sorted_hashes[1:] != sorted_hashes[:-1]]))
+    first = np.minimum.reduceat(order, starts) if len(order) else order
+    counts = np.diff(np.append(starts, len(order)))
+
+    # Check every repeated triangle against the first one of its group
+    repeated = np.flatnonzero(np.repeat(counts > 1, counts))
+    group = np.repeat(np.arange(len(starts)), counts)[repeated]
+    collided = np.zeros(len(starts), dtype=bool)
+    for rows in iter_chunks(len(repeated), chunk_rows):
+        indexes, groups = order[repeated[rows]], group[rows]
+        in_file_order = np.argsort(indexes)  # Sequential reads of a memory-mapped file
+        indexes, groups = indexes[in_file_order], groups[in_file_order]
+        mismatch = (triangle_keys(vectors[indexes]) != triangle_keys(vectors[first[groups]])).any(axis=1)
+        collided[groups[mismatch]] = True
+    if collided.any():
+        # Split the groups that mix different triangles exactly
+        rows = np.sort(order[collided[np.repeat(np.arange(len(starts)), counts)]])
+        keys = triangle_keys(vectors[rows]).view(KEY_DTYPE).ravel()
+        _, positions, exact_counts = np.unique(keys, return_index=True, return_counts=True)
+        first = np.concatenate([first[~collided], rows[positions]])
+        counts = np.concatenate([counts[~collided], exact_counts])
+
+    # Back to file order; triangles with a NaN coordinate are unique
+    occurrences = (~valid).astype(np.int64)
+    occurrences[first] = counts
+    first = np.flatnonzero(occurrences)
+    return first, occurrences[first]
+
+
+def unique_triangle_mask(vectors):
+    """
+    Boolean mask of the first occurrence of every distinct triangle (duplicates are False)
+
+    Args:
+        vectors: float32 array (N, 3, 3) of triangles
+    Returns:
+        numpy.ndarray: bool array (N,)
+    """
+    keep = np.zeros(len(vectors), dtype=bool)
+    keep[unique_triangles(vectors)[0]] = True
+    return keep
+
+
+#: Record of a bucket file of unique_triangle_mask_external: triangle index and coordinate bits (44 bytes)
+BUCKET_DTYPE = np.dtype([('index', '<i8'), ('key', '<u4', (9,))])
+#: Working memory per triangle of the hashing, sorting and bucketing steps, in bytes
+ROW_COST = 256
+#: Number of times an overfull bucket is split again with a new seed before it is processed anyway
+MAX_BUCKET_SPLITS = 3
+
+
+def _partition(batches, bucket_count, directory):
+    """
+    Append bucket records to bucket_count files, chosen by a seeded hash of their key
+
+    Args:
+        batches: Iterable of BUCKET_DTYPE arrays, in file order
+        bucket_count: Number of bucket files
+        directory: Directory of the bucket files
+    Returns:
+        list: (path, number of records) of every bucket; records keep their order inside a bucket
+    """
+    seed = int.from_bytes(os.urandom(8), 'little')
+    paths = [os.path.join(directory, 'bucket_%d.bin' % bucket) for bucket in range(bucket_count)]
+    sizes = np.zeros(bucket_count, dtype=np.int64)
+    for records in batches:
+        # High bits of the product depend on every bit of the hash
+        buckets = ((hash_triangles(records['key'], seed) * HASH_MULTIPLIER) >> np.uint64(32)) % np.uint64(bucket_count)
+        order = np.argsort(buckets, kind='stable')
+        bounds = np.searchsorted(buckets[order], np.arange(bucket_count + 1))
+        for bucket in np.flatnonzero(np.diff(bounds)):
+            with open(paths[bucket], 'ab') as f:
+                records[order[bounds[bucket]:bounds[bucket + 1]]].tofile(f)
+        sizes += np.diff(bounds)
+    return [(path, int(size)) for path, size in zip(paths, sizes) if size]
+
+
+def _read_records(path, size, chunk_rows):
+    # Bucket file read back in chunks of records
+    for start in range(0, size, chunk_rows):
+        yield np.fromfile(path, dtype=BUCKET_DTYPE, count=min(chunk_rows, size - start),
+                          offset=start * BUCKET_DTYPE.itemsize)
+
+
+def _drop_bucket_duplicates(keep, path, size, rows_budget, splits):
+    """
+    Clear in keep every record of a bucket file that repeats an earlier record of the same bucket
+    """
+    if size > rows_budget and splits < MAX_BUCKET_SPLITS:
+        # Overfull bucket (skewed hashes): split it again with a new seed
+        directory = tempfile.mkdtemp(dir=os.path.dirname(path))
+        buckets = _partition(_read_records(path, size, rows_budget), -(-size // rows_budget) * 2, directory)
+        os.remove(path)
+        for bucket_path, bucket_size in buckets:
+            _drop_bucket_duplicates(keep, bucket_path, bucket_size, rows_budget, splits + 1)
+        return
+
+    records = np.fromfile(path, dtype=BUCKET_DTYPE)
+    os.remove(path)
+    unique = np.zeros(len(records), dtype=bool)
+    unique[unique_triangles(records['key'].view(np.float32).reshape(-1, 3, 3))[0]] = True
+    keep[records['index'][~unique]] = False
+
+
+def unique_triangle_mask_external(vectors, memory_budget, directory):
+    """
+    unique_triangle_mask for meshes larger than memory, with a peak working memory of about
+    memory_budget bytes whatever the number of triangles
+
+    Triangles are read in chunks; the duplicates inside a chunk are dropped at once and the other
+    triangles are hash-partitioned into temporary bucket files (index and 36 coordinate bytes).
+    Equal triangles always land in the same bucket, so every bucket is deduplicated on its own, in
+    memory. The mask itself is a memory-mapped file.
+
+    Args:
+        vectors: float32 array (N, 3, 3) of triangles, typically the memory-mapped load_stl(path)['vectors']
+        memory_budget: Working memory in bytes
+        directory: Existing directory for the mask and bucket files, removed by the caller once the
+                   mask is no longer used (e.g. a tempfile.TemporaryDirectory)
+    Returns:
+        numpy.ndarray: bool array (N,), True for the first occurrence of every distinct triangle
+    """
+    count = len(vectors)
+    if count == 0:
+        return np.zeros(0, dtype=bool)
+    rows_budget = max(1024, int(memory_budget) // ROW_COST)
+    keep = np.memmap(os.path.join(directory, 'keep.bin'), dtype=bool, mode='w+', shape=(count,))
+
+    def batches():
+        for rows in iter_chunks(count, rows_budget):
+            chunk = vectors[rows]
+            unique = np.zeros(len(chunk), dtype=bool)
+            unique[unique_triangles(chunk)[0]] = True
+            keep[rows] = unique
+            # Triangles with a NaN coordinate stay unique
+            candidates = np.flatnonzero(unique & ~np.isnan(chunk).any(axis=(1, 2)))
+            records = np.empty(len(candidates), dtype=BUCKET_DTYPE)
+            records['index'] = candidates + rows.start
+            records['key'] = triangle_keys(chunk[candidates])
+            yield records
+
+    # Twice as many buckets as budgets, like the re-split of an oversized bucket, so that hash
+    # imbalance rarely pushes a bucket over rows_budget
+    buckets = _partition(batches(), -(-count // rows_budget) * 2, tempfile.mkdtemp(dir=directory))
+    for path, size in buckets:
+        _drop_bucket_duplicates(keep, path, size, rows_budget, 0)
+    keep.flush()
+    return keep
@@ -1,60 +1,56 @@
-from stl import mesh
-import numpy as np
-from collections import Counter
-
-
-def deep_tuple(nested_obj):
-    """
-    Recursively convert nested lists/arrays to hashable tuples
-
-    Args:
-        nested_obj: Input list, tuple or numpy array
-    Returns:
-        tuple: Immutable nested tuple representation
-    """
-    if isinstance(nested_obj, np.ndarray):
-        nested_obj = nested_obj.tolist()
-    return tuple(deep_tuple(sub) if isinstance(sub, (list, tuple, np.ndarray)) else sub
-                 for sub in nested_obj)
-
-
-def find_unique_triangle_indices(triangles):
-    """
-    Find indices of first occurrences of unique triangles
-
-    Args:
-        triangles: List of triangle vertices to process
-    Returns:
-        list: Indices of first unique triangles
-    """
-    # Count occurrences of each triangle pattern
-    pattern_counts = Counter(map(deep_tuple, triangles))
-    seen_patterns = set()
-    unique_indices = []
-
-    for idx, triangle in enumerate(triangles):
-        pattern = deep_tuple(triangle)
-        if pattern not in seen_patterns:
-            unique_indices.append(idx)
-            seen_patterns.add(pattern)
-
-    return unique_indices
-
-
-def remove_overlapping_triangles(input_path, output_path):
-    """
-    Remove duplicate triangles from STL file to prevent model overlap attacks
-
-    Args:
-        input_path: Path to input STL file
-        output_path: Path for cleaned output STL file
-    """
-    # Load mesh and find unique triangles
-    in_mesh = mesh.Mesh.from_file(input_path)
-    unique_indices = find_unique_triangle_indices(in_mesh.vectors)
-
-    # Create new mesh with only unique triangles
-    out_data = np.array([in_mesh.data[i] for i in unique_indices],
-                        dtype=in_mesh.data.dtype)
-    out_mesh = mesh.Mesh(out_data)
-    out_mesh.save(output_path)
\ No newline at end of file
+import file_handle as fd
+import numpy as np
+import tempfile
+import os
+
+
+def deep_tuple(nested_obj):
+    """
+    Recursively convert nested lists/arrays to hashable tuples
+
+    Args:
+        nested_obj: Input list, tuple or numpy array
+    Returns:
+        tuple: Immutable nested tuple representation
+    """
+    if isinstance(nested_obj, np.ndarray):
+        nested_obj = nested_obj.tolist()
+    return tuple(deep_tuple(sub) if isinstance(sub, (list, tuple, np.ndarray)) else sub
+                 for sub in nested_obj)
+
+
+def find_unique_triangle_indices(triangles):
+    """
+    Find indices of first occurrences of unique triangles
+
+    Args:
+        triangles: float32 array (N, 3, 3) of triangle vertices to process
+    Returns:
+        numpy.ndarray: Indices of first unique triangles, in file order (see file_handle.unique_triangles)
+    """
+    return fd.unique_triangles(triangles)[0]
+
+
+def remove_overlapping_triangles(input_path, output_path, memory_budget=None):
+    """
+    Remove duplicate triangles from STL file to prevent model overlap attacks
+
+    Args:
+        input_path: Path to input STL file
+        output_path: Path for cleaned output STL file
+        memory_budget: Optional working memory in bytes; when given, duplicates are found out of core
+                       (file_handle.unique_triangle_mask_external) with temporary files next to the output
+    """
+    # Load mesh (memory-mapped for binary STL)
+    in_data = fd.load_stl(input_path)
+
+    if memory_budget is None:
+        # Write only the unique triangles
+        fd.write_stl(output_path, in_data, fd.unique_triangle_mask(in_data['vectors']))
+        return
+
+    # Stream the unique triangles in their original order, memory_budget bytes at a time
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as directory:
+        keep = fd.unique_triangle_mask_external(in_data['vectors'], memory_budget, directory)
+        fd.write_stl(output_path, in_data, keep, chunk_rows=max(1, memory_budget // fd.ROW_COST))
+        del keep